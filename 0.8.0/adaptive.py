@@ -0,0 +1,122 @@
+import time
+
+import rates
+import riemann
+
+__all__ = ['Adaptive']
+
+# what Adaptive reads from a stats document, see project.py
+PATHS = [
+    'read',
+    'cpu_stats.cpu_usage.total_usage',
+    'memory_stats.usage',
+]
+
+
+class Adaptive(object):
+    """Sample idle containers less often
+
+    A container that has used less than cpu cores and whose memory usage
+    has moved less than memory (relative) for idle samples in a row is
+    demoted from the stats stream to one-shot polls every interval seconds,
+    a poll over either threshold promotes it back to the stream.
+
+        >>> adaptive = Adaptive(interval=30, idle=2, cpu=0.01, memory=0.01)
+        >>> adaptive.add('123')
+        >>> def sample(second, cpu, memory):
+        ...     return {'read': '2015-09-23T04:13:%02dZ' % second,
+        ...             'cpu_stats': {'cpu_usage': {'total_usage': cpu}}, 'memory_stats': {'usage': memory}}
+        >>> for second in (0, 1, 2):
+        ...     adaptive.handle('123', sample(second, 1000, 100), 0)
+        >>> adaptive.check('123', 0), adaptive.mode('123')
+        ('poll', 'poll')
+        >>> adaptive.due('123', 0), adaptive.due('123', 29), adaptive.due('123', 30), adaptive.due('123', 31)
+        (False, False, True, False)
+        >>> adaptive.handle('123', sample(32, 1000, 100), 31)
+        >>> adaptive.check('123', 31)
+        >>> adaptive.handle('123', sample(62, 10**9, 100), 61)
+        >>> adaptive.check('123', 61), adaptive.mode('123')
+        ('stream', 'stream')
+
+    """
+
+    def __init__(self, interval=30, idle=30, cpu=0.01, memory=0.01):
+        self.interval = interval
+        self.idle = idle
+        self.cpu = cpu
+        self.memory = memory
+
+        # container id -> [mode, quiet samples, (read, cpu, memory), next poll]
+        self.containers = {}
+
+    def add(self, id_):
+        self.containers[id_] = ['stream', 0, None, None]
+
+    def forget(self, id_):
+        self.containers.pop(id_, None)
+
+    def mode(self, id_):
+        return self.containers[id_][0]
+
+    def handle(self, id_, data, now):
+        c = self.containers.get(id_)
+        if c is None:
+            return
+
+        try:
+            sample = (rates.timestamp(data['read']),
+                      data['cpu_stats']['cpu_usage']['total_usage'],
+                      data['memory_stats']['usage'])
+        except (KeyError, TypeError, ValueError):
+            # e.g. a stopped container, counts as busy
+            c[1] = 0
+            return
+
+        last, c[2] = c[2], sample
+        if last is None or sample[0] <= last[0]:
+            return
+
+        cores = (sample[1] - last[1]) / 1e9 / (sample[0] - last[0])
+        moved = abs(sample[2] - last[2]) / float(max(last[2], 1))
+
+        if cores < self.cpu and moved < self.memory:
+            c[1] += 1
+        else:
+            c[1] = 0
+
+    def check(self, id_, now):
+        """'poll' or 'stream' when the container should change over, else None"""
+        c = self.containers[id_]
+
+        if c[0] == 'stream' and c[1] >= self.idle:
+            c[0] = 'poll'
+            c[3] = now + self.interval
+            return 'poll'
+
+        if c[0] == 'poll' and c[1] == 0:
+            c[0] = 'stream'
+            return 'stream'
+
+    def due(self, id_, now):
+        """True when a poll should be made, once every interval seconds"""
+        c = self.containers[id_]
+
+        if c[0] != 'poll' or now < c[3]:
+            return False
+
+        c[3] = now + self.interval
+        return True
+
+    def event(self, info, now):
+        """The container's stats interval, to see rate changes in riemann"""
+        poll = self.containers[info['Id']][0] == 'poll'
+
+        return {
+            'time': int(now),
+            'state': 'ok',
+            'service': 'container %s stats interval' % info['Name'].lstrip('/'),
+            'tags': [],
+            'ttl': 2 * self.interval if poll else 60,
+            'attributes': riemann.container_attributes(info, time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))),
+            'metric_d': float(self.interval) if poll else 1.0,
+        }
@@ -0,0 +1,216 @@
+#!/usr/local/bin/python3
+"""Benchmarks
+
+    python3 bench.py [name ...]
+
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import timeit
+
+import classify
+import drain
+import flatten
+import netdev
+import project
+import riemann
+
+
+def bench_netdev(n=1000, number=100):
+    proc = tempfile.mkdtemp()
+
+    sampler = netdev.Sampler(proc)
+    for pid in range(n):
+        netdev.fake(proc, pid, pid, pid)
+        sampler.add(pid, pid)
+
+    t = timeit.timeit(sampler.sweep, number=number) / number
+
+    print('netdev: %d containers, %.2f ms per sweep, %.1f us per container' % (n, t * 1e3, t / n * 1e6))
+
+    for pid in range(n):
+        sampler.remove(pid)
+
+
+def stats_document(ncpu=64):
+    """A /containers/<id>/stats document as docker 1.9 on an ncpu host"""
+    percpu = [random.randrange(10 ** 12) for _ in range(ncpu)]
+
+    cpu_stats = {
+        'cpu_usage': {
+            'total_usage': sum(percpu),
+            'percpu_usage': percpu,
+            'usage_in_kernelmode': 10 ** 10,
+            'usage_in_usermode': 10 ** 11,
+        },
+        'system_cpu_usage': 10 ** 15,
+        'throttling_data': {'periods': 0, 'throttled_periods': 0, 'throttled_time': 0},
+    }
+
+    stats = dict((k, random.randrange(10 ** 9)) for k in [
+        'active_anon', 'active_file', 'cache', 'dirty', 'hierarchical_memory_limit', 'inactive_anon',
+        'inactive_file', 'mapped_file', 'pgfault', 'pgmajfault', 'pgpgin', 'pgpgout', 'rss',
+        'rss_huge', 'swap', 'unevictable', 'writeback'])
+    stats.update([('total_' + k, v) for k, v in stats.items()])
+
+    blkio = [{'major': 8, 'minor': i, 'op': op, 'value': random.randrange(10 ** 9)}
+             for i in range(4) for op in ('Read', 'Write', 'Sync', 'Async', 'Total')]
+
+    return json.dumps({
+        'read': '2015-09-23T04:13:56.297129480Z',
+        'network': dict((k, random.randrange(10 ** 9)) for k in [
+            'rx_bytes', 'rx_packets', 'rx_errors', 'rx_dropped', 'tx_bytes', 'tx_packets', 'tx_errors', 'tx_dropped']),
+        'precpu_stats': cpu_stats,
+        'cpu_stats': cpu_stats,
+        'memory_stats': {'usage': 1, 'max_usage': 2, 'stats': stats, 'failcnt': 0, 'limit': 10 ** 10},
+        'blkio_stats': {'io_service_bytes_recursive': blkio, 'io_serviced_recursive': blkio},
+    }, separators=(',', ':')).encode('utf-8')
+
+
+def bench_project(number=10000):
+    # one document per line, e.g. curl --unix-socket /var/run/docker.sock http:/containers/<id>/stats
+    path = os.getenv('STATS_CAPTURE')
+    if path:
+        with open(path, 'rb') as f:
+            documents = [x for x in f.read().splitlines() if x.strip()]
+    else:
+        documents = [stats_document() for _ in range(10)]
+
+    number = max(1, number // len(documents))
+
+    def run(loads):
+        return timeit.timeit(lambda: [loads(x) for x in documents], number=number) / number / len(documents)
+
+    full = run(lambda x: json.loads(x.decode('utf-8')))
+    print('project: %d documents, %d bytes average' % (len(documents), sum(len(x) for x in documents) / len(documents)))
+    print('project: json.loads %.1f us' % (full * 1e6))
+
+    for name, paths in [
+            ('handle_stat', riemann.DEFAULT.paths),
+            ('cpu+memory', ['read', 'cpu_stats.cpu_usage.total_usage', 'memory_stats.usage', 'memory_stats.limit'])]:
+        p = project.Projection(paths)
+        t = run(p.loads)
+        print('project: %s %.1f us (%.2fx), %d fallbacks' % (name, t * 1e6, full / t, p.fallbacks))
+
+
+def bench_classify(n=100, lines=10000):
+    rules = [{'pattern': r'\bE%03d\b|failed to (open|read) /var/%d' % (i, i), 'state': 'warning', 'tags': ['e%d' % i]} for i in range(n)]
+
+    logs = ['%s GET /api/v1/items/%d 200 %dms user=%x' % ('E%03d' % random.randrange(n) if random.random() < 0.05 else 'INFO', random.randrange(10 ** 6), random.randrange(500), random.randrange(2 ** 32))
+            for _ in range(lines)]
+
+    c = classify.Classify(rules)
+    compiled = [re.compile(x['pattern']) for x in rules]
+
+    a = timeit.timeit(lambda: [[p for p in compiled if p.search(x)] for x in logs], number=1) / lines
+    b = timeit.timeit(lambda: [c.match(x) for x in logs], number=1) / lines
+
+    # what prefiltering is up against, one alternation of every rule, scaled
+    # from 45 rules as python < 3.5 allows only 100 groups in a pattern
+    alternation = re.compile('|'.join('(%s)' % x['pattern'] for x in rules[:45]))
+    d = timeit.timeit(lambda: [list(alternation.finditer(x)) for x in logs], number=1) / lines * n / 45
+
+    print('classify: %d rules, %d prefiltered, %d lines, 5%% matching' % (n, len(c.prefiltered), lines))
+    print('classify: a search per rule %.1f us per line' % (a * 1e6))
+    print('classify: one alternation %.1f us per line (%.1fx)' % (d * 1e6, a / d))
+    print('classify: prefiltered %.1f us per line (%.1fx)' % (b * 1e6, a / b))
+
+
+def bench_drain(shapes=300, n=100000):
+    words = ['user', 'request', 'connected', 'to', 'from', 'failed', 'retry', 'GET', 'POST', 'took', 'session', 'cache', 'miss', 'queue']
+
+    templates = [[random.choice(words + ['%d', '%x']) for _ in range(random.randint(3, 16))] for _ in range(shapes)]
+
+    def line(template):
+        return ' '.join(x % random.randrange(10 ** 6) if '%' in x else x for x in template).encode('utf-8')
+
+    lines = [line(random.choice(templates)) for _ in range(n)]
+
+    d = drain.Drain()
+    t = timeit.timeit(lambda: [d.mine(x) for x in lines], number=1) / n
+
+    tokens = sum(len(x.tokens) for x in d.clusters.values())
+
+    print('drain: %d lines of %d shapes, %.1f us per line, %d templates, %d tokens' % (n, shapes, t * 1e6, len(d.clusters), tokens))
+
+    d = drain.Drain(max_clusters=100)
+    t = timeit.timeit(lambda: [d.mine(x) for x in lines], number=1) / n
+
+    print('drain: max_clusters=100, %.1f us per line, %d templates' % (t * 1e6, len(d.clusters)))
+
+
+def bench_flatten(number=1000):
+    import riemann_client.client
+    import riemann_client.riemann_pb2
+
+    info = {'Name': 'foo', 'Id': '123', 'Config': {'Image': 'centos:7', 'Cmd': ['true'], 'Entrypoint': ''}, 'Image': 'abc'}
+    data = json.loads(stats_document(ncpu=4).decode('utf-8'))
+    data['blkio_stats'] = {}
+
+    def encode(events):
+        msg = riemann_client.riemann_pb2.Msg()
+        for event in events:
+            msg.events.add().MergeFrom(riemann_client.client.Client.create_event(dict(event)))
+        return msg.SerializeToString()
+
+    for name, f in [
+            ('events', lambda: riemann.handle_stat(data, info)),
+            ('document', lambda: flatten.Flatten().handle(riemann.handle_stat(data, info), 0))]:
+        t = timeit.timeit(lambda: encode(f()), number=number) / number
+        print('flatten: %s %d events, %d bytes, %.0f us per sample' % (name, len(f()), len(encode(f())), t * 1e6))
+
+
+def bench_metrics(number=2000):
+    info = {'Name': 'foo', 'Id': '123', 'Config': {'Image': 'centos:7', 'Cmd': ['true'], 'Entrypoint': ''}, 'Image': 'abc'}
+    data = json.loads(stats_document().decode('utf-8'))
+
+    for name, spec in [
+            ('default', riemann.METRICS),
+            ('cpu+memory', ['cpu total usage', 'memory usage', 'memory limit'])]:
+        metrics = riemann.compile(spec)
+        t = timeit.timeit(lambda: riemann.handle_stat(data, info, metrics), number=number) / number
+        print('metrics: %s %d events, %.1f us per sample' % (name, len(riemann.handle_stat(data, info, metrics)), t * 1e6))
+
+
+def bench_percpu(ncpu=64, number=200):
+    import riemann_client.client
+    import riemann_client.riemann_pb2
+
+    info = {'Name': 'foo', 'Id': '123', 'Config': {'Image': 'centos:7', 'Cmd': ['true'], 'Entrypoint': ''}, 'Image': 'abc'}
+    data = json.loads(stats_document(ncpu).decode('utf-8'))
+
+    def encode(events):
+        msg = riemann_client.riemann_pb2.Msg()
+        for event in events:
+            msg.events.add().MergeFrom(riemann_client.client.Client.create_event(dict(event)))
+        return msg.SerializeToString()
+
+    # what the commented out per core block in handle_stat would have sent
+    def per_core(data, info):
+        return [dict(event, service='container foo cpu usage in cpu%d' % i, metric_sint64=x)
+                for event in riemann.handle_stat(data, info, riemann.compile(['cpu total usage']))
+                for i, x in enumerate(data['cpu_stats']['cpu_usage']['percpu_usage'])]
+
+    for name, f in [
+            ('per core', per_core),
+            ('vector', lambda data, info: riemann.handle_stat(data, info, riemann.compile(['cpu percpu usage']))),
+            ('summary', lambda data, info: riemann.handle_stat(data, info, riemann.compile(['cpu percpu max', 'cpu percpu min', 'cpu percpu stddev'])))]:
+        events = f(data, info)
+        t = timeit.timeit(lambda: encode(f(data, info)), number=number) / number
+        print('percpu: %d cores, %s %d events, %d bytes, %.0f us per sample' % (ncpu, name, len(events), len(encode(events)), t * 1e6))
+
+
+def main():
+    names = sys.argv[1:] or sorted(x[6:] for x in globals() if x.startswith('bench_'))
+
+    for name in names:
+        globals()['bench_' + name]()
+
+
+if __name__ == '__main__':
+    main()
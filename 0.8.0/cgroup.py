@@ -0,0 +1,249 @@
+import os
+import time
+
+__all__ = ['Stats', 'Sampler']
+
+
+def meminfo(path='/proc/meminfo'):
+    with open(path) as f:
+        for line in f:
+            if line.startswith('MemTotal:'):
+                return int(line.split()[1]) * 1024
+
+
+class Stats(object):
+    """Container stats read from cgroupfs
+
+    The files are opened once and re-read with pread() each sample, the
+    result has the same shape as a /containers/<id>/stats document so it can
+    go to riemann.handle_stat.
+
+    cgroup v1:
+
+        >>> import tempfile
+        >>> root = tempfile.mkdtemp()
+        >>> _ = fake(root, 'abc', {
+        ...     'cpuacct/docker/abc/cpuacct.usage': '5325369948\\n',
+        ...     'memory/docker/abc/memory.usage_in_bytes': '358744064\\n',
+        ...     'memory/docker/abc/memory.limit_in_bytes': '1044631552\\n',
+        ...     'memory/docker/abc/memory.stat': 'cache 2330624\\nrss 356286464\\ntotal_rss 356286465\\nswap 0\\n',
+        ... })
+        >>> stats = Stats('abc', root)
+        >>> stats.version
+        1
+        >>> data = stats.read()
+        >>> data['cpu_stats']['cpu_usage']['total_usage']
+        5325369948
+        >>> data['memory_stats']['usage'], data['memory_stats']['limit']
+        (358744064, 1044631552)
+        >>> data['memory_stats']['stats']['total_rss']
+        356286465
+        >>> stats.close()
+
+    cgroup v2:
+
+        >>> root = tempfile.mkdtemp()
+        >>> _ = fake(root, 'abc', {
+        ...     'system.slice/docker-abc.scope/cpu.stat': 'usage_usec 5325369\\nuser_usec 5040000\\nsystem_usec 250000\\n',
+        ...     'system.slice/docker-abc.scope/memory.current': '358744064\\n',
+        ...     'system.slice/docker-abc.scope/memory.max': 'max\\n',
+        ...     'system.slice/docker-abc.scope/memory.stat': 'anon 356286464\\nfile 2330624\\n',
+        ... })
+        >>> stats = Stats('abc', root, memtotal=1044631552)
+        >>> stats.version
+        2
+        >>> data = stats.read()
+        >>> data['cpu_stats']['cpu_usage']['total_usage']
+        5325369000
+        >>> data['memory_stats']['limit']
+        1044631552
+        >>> data['memory_stats']['stats']['rss'], data['memory_stats']['stats']['cache']
+        (356286464, 2330624)
+        >>> stats.close()
+
+        >>> Stats('def', root)
+        Traceback (most recent call last):
+        ...
+        FileNotFoundError: cgroup for def
+
+    Without cpuacct.usage the container is left to the API:
+
+        >>> root = tempfile.mkdtemp()
+        >>> _ = fake(root, 'abc', {
+        ...     'cpu/docker/abc/cpu.shares': '1024\\n',
+        ...     'memory/docker/abc/memory.usage_in_bytes': '358744064\\n',
+        ...     'memory/docker/abc/memory.limit_in_bytes': '1044631552\\n',
+        ...     'memory/docker/abc/memory.stat': 'cache 2330624\\n',
+        ... })
+        >>> Stats('abc', root)
+        Traceback (most recent call last):
+        ...
+        FileNotFoundError: cgroup for abc
+        >>> _ = fake(root, 'abc', {'cpu,cpuacct/docker/abc/cpuacct.usage': '5325369948\\n'})
+        >>> Stats('abc', root).read()['cpu_stats']['cpu_usage']['total_usage']
+        5325369948
+
+    """
+
+    def __init__(self, id_, root='/sys/fs/cgroup', memtotal=None):
+        self.id_ = id_
+        self.memtotal = memtotal
+        self.fds = {}
+
+        v2 = [os.path.join(root, 'system.slice', 'docker-%s.scope' % id_),
+              os.path.join(root, 'docker', id_)]
+        v1 = [os.path.join('docker', id_),
+              os.path.join('system.slice', 'docker-%s.scope' % id_)]
+
+        for path in v2:
+            if os.path.exists(os.path.join(path, 'memory.current')):
+                self.version = 2
+                self.open(path, ['cpu.stat', 'memory.current', 'memory.max', 'memory.stat', 'memory.swap.current'])
+                return
+
+        for path in v1:
+            if not os.path.exists(os.path.join(root, 'memory', path, 'memory.stat')):
+                continue
+
+            # cpuacct is often mounted with cpu, not always linked as cpuacct
+            for name in ('cpuacct', 'cpu,cpuacct', 'cpuacct,cpu'):
+                if os.path.exists(os.path.join(root, name, path, 'cpuacct.usage')):
+                    self.version = 1
+                    self.open(os.path.join(root, name, path), ['cpuacct.usage'])
+                    self.open(os.path.join(root, 'memory', path), ['memory.usage_in_bytes', 'memory.limit_in_bytes', 'memory.stat'])
+                    return
+
+        raise FileNotFoundError('cgroup for %s' % id_)
+
+    def open(self, path, names):
+        for name in names:
+            try:
+                self.fds[name] = os.open(os.path.join(path, name), os.O_RDONLY)
+            except FileNotFoundError:
+                # e.g. memory.swap.current without swap accounting
+                pass
+
+    def pread(self, name):
+        return os.pread(self.fds[name], 65536, 0)
+
+    def value(self, name):
+        return int(self.pread(name))
+
+    def table(self, name):
+        return dict((k.decode('ascii'), int(v)) for k, v in (line.split() for line in self.pread(name).splitlines()))
+
+    def read(self, now=None):
+        now = now if now is not None else time.time()
+
+        if self.memtotal is None:
+            self.memtotal = meminfo()
+
+        if self.version == 2:
+            cpu = self.table('cpu.stat')
+            cpu_usage = {
+                'total_usage': cpu['usage_usec'] * 1000,
+                'usage_in_kernelmode': cpu.get('system_usec', 0) * 1000,
+                'usage_in_usermode': cpu.get('user_usec', 0) * 1000,
+            }
+
+            stats = self.table('memory.stat')
+            # the v1 names handle_stat looks for
+            stats['rss'] = stats.get('anon', 0)
+            stats['cache'] = stats.get('file', 0)
+            if 'memory.swap.current' in self.fds:
+                stats['swap'] = self.value('memory.swap.current')
+
+            usage = self.value('memory.current')
+
+            limit = self.pread('memory.max').strip()
+            limit = self.memtotal if limit == b'max' else min(int(limit), self.memtotal)
+        else:
+            cpu_usage = {
+                'total_usage': self.value('cpuacct.usage'),
+            }
+
+            stats = self.table('memory.stat')
+
+            usage = self.value('memory.usage_in_bytes')
+
+            limit = min(self.value('memory.limit_in_bytes'), self.memtotal)
+
+        return {
+            'read': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now)) + '.%09dZ' % int(now % 1 * 1e9),
+            'blkio_stats': {},
+            'cpu_stats': {'cpu_usage': cpu_usage},
+            'memory_stats': {'usage': usage, 'limit': limit, 'stats': stats},
+        }
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
+
+
+class Sampler(object):
+    """Sample every container in one pass per interval
+
+        >>> import tempfile
+        >>> root = tempfile.mkdtemp()
+        >>> _ = fake(root, 'abc', {
+        ...     'cpuacct/docker/abc/cpuacct.usage': '1\\n',
+        ...     'memory/docker/abc/memory.usage_in_bytes': '2\\n',
+        ...     'memory/docker/abc/memory.limit_in_bytes': '4\\n',
+        ...     'memory/docker/abc/memory.stat': 'cache 0\\n',
+        ... })
+        >>> sampler = Sampler(root, interval=10, memtotal=8)
+        >>> sampler.add('container', 'abc')
+        >>> [(c, d['memory_stats']['usage']) for c, d in sampler.sample(100)]
+        [('container', 2)]
+        >>> sampler.sample(105)
+        []
+        >>> len(sampler.sample(110))
+        1
+        >>> sampler.remove('container')
+        >>> sampler.sample(120)
+        []
+
+    """
+
+    def __init__(self, root='/sys/fs/cgroup', interval=1.0, memtotal=None):
+        self.root = root
+        self.interval = interval
+        self.memtotal = memtotal
+        self.stats = {}
+        self.last = 0
+
+    def add(self, container, id_):
+        self.stats[container] = Stats(id_, self.root, self.memtotal)
+
+    def remove(self, container):
+        stats = self.stats.pop(container, None)
+        if stats is not None:
+            stats.close()
+
+    def sample(self, now):
+        if now - self.last < self.interval:
+            return []
+        self.last = now
+
+        samples = []
+
+        for container, stats in list(self.stats.items()):
+            try:
+                samples.append((container, stats.read(now)))
+            except (OSError, ValueError) as exc:
+                # the cgroup goes away before the container leaves the listing
+                print(container, 'cgroup', exc)
+                self.remove(container)
+
+        return samples
+
+
+def fake(root, id_, files):
+    """Write a fake cgroup tree, for tests"""
+    for name, content in files.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+    return root
@@ -0,0 +1,224 @@
+import re
+
+__all__ = ['Classify']
+
+SEVERITY = {'ok': 0, 'warning': 1, 'critical': 2}
+
+# {m}, {m,}, {,n} and {m,n}, any other { is a literal
+REPEAT = re.compile(r'\{(\d+(,\d*)?|,\d+)\}')
+
+
+def skip_class(pattern, i):
+    """The index after the character class starting at i"""
+    j = i + 1
+    if pattern[j:j + 1] == '^':
+        j += 1
+    if pattern[j:j + 1] == ']':
+        j += 1
+    while j < len(pattern) and pattern[j] != ']':
+        j += 2 if pattern[j] == '\\' else 1
+    return j + 1
+
+
+def literals(pattern):
+    """Strings one of which is in anything pattern matches, None if unknown
+
+        >>> literals('OutOfMemory(Error)?')
+        ['OutOfMemory']
+        >>> literals(r'timed? ?out|deadline exceeded')
+        ['time', 'deadline exceeded']
+        >>> literals(r'\\bE\\d+\\b') is None
+        True
+        >>> literals(r'[\\]x]abc[]]def')
+        ['abc']
+        >>> literals(r'connect to \\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3} failed')
+        ['connect to ']
+        >>> literals(r'x{2}yz{3,}abc')
+        ['abc']
+        >>> literals(r'(?x) connection \\s+ refused') is None, literals(r'\\x41BCD') is None, literals(r'(a)\\1bcd') is None
+        (True, True, True)
+
+    """
+    # whitespace and comments aren't literal in verbose patterns
+    if re.compile(pattern).flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+
+    # top level branches
+    branches = ['']
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            branches[-1] += pattern[i:i + 2]
+            i += 2
+            continue
+        if c == '[':
+            j = skip_class(pattern, i)
+            branches[-1] += pattern[i:j]
+            i = j
+            continue
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            branches.append('')
+            i += 1
+            continue
+        branches[-1] += c
+        i += 1
+
+    result = []
+
+    for branch in branches:
+        best = run = ''
+        depth = 0
+        i = 0
+        while i < len(branch):
+            c = branch[i]
+            if c == '\\':
+                # \x41, \101, \1 and the like stand for more than their last character
+                if branch[i + 1:i + 2] in ('x', 'u', 'U', 'N') or branch[i + 1:i + 2].isdigit():
+                    return None
+                literal = branch[i + 1:i + 2] if not branch[i + 1:i + 2].isalnum() else None
+                i += 2
+            elif c == '[':
+                literal = None
+                i = skip_class(branch, i)
+            elif c in '()':
+                depth += 1 if c == '(' else -1
+                literal = None
+                i += 1
+            elif c in '.^$*+?{}|' or depth:
+                literal = None
+                i += 1
+            else:
+                literal = c
+                i += 1
+
+            quantifier = branch[i:i + 1]
+            if quantifier == '{':
+                m = REPEAT.match(branch, i)
+                if m is not None:
+                    i = m.end()
+            if literal is not None and quantifier in ('?', '*', '{'):
+                literal = None
+
+            if literal is None:
+                best = max(best, run, key=len)
+                run = ''
+            else:
+                run += literal
+                # at least one, but no more after it
+                if quantifier == '+':
+                    best = max(best, run, key=len)
+                    run = ''
+
+        best = max(best, run, key=len)
+        if len(best) < 3:
+            return None
+        result.append(best)
+
+    return result
+
+
+class Rule(object):
+
+    __slots__ = ['name', 'pattern', 'regex', 'literals', 'state', 'tags', 'hits']
+
+    def __init__(self, pattern, state=None, tags=(), name=None):
+        self.name = name or pattern
+        self.pattern = pattern
+        self.regex = re.compile(pattern)
+        self.literals = literals(pattern)
+        self.state = state
+        self.tags = list(tags)
+        self.hits = 0
+
+
+class Classify(object):
+    """Set the state and tags of log events from their content
+
+    Rules are {"pattern": regex, "state": "ok"|"warning"|"critical",
+    "tags": [...]}. A rule with a literal every match must contain (see
+    literals) is only searched for when the literal is in the line, so most
+    lines cost a substring test per rule rather than a regex search. The
+    event gets the tags of every rule that matches and the most severe of
+    their states and its own.
+
+        >>> classify = Classify([
+        ...     {'pattern': r'OutOfMemory(Error)?', 'state': 'critical', 'tags': ['oom']},
+        ...     {'pattern': r'(?:WARN|WARNING)\\b', 'state': 'warning'},
+        ...     {'pattern': r'timed? ?out', 'tags': ['timeout']},
+        ...     {'pattern': r'(?i)^panic', 'state': 'critical'},
+        ... ])
+        >>> def event(log, state='ok'):
+        ...     return {'state': state, 'tags': [], 'attributes': {'log': log}}
+        >>> [(x['state'], x['tags']) for x in classify.handle([event('WARN request timed out'), event('java.lang.OutOfMemoryError'),
+        ...                                                    event('GET / 200'), event('timeout', 'critical')], 0)]
+        [('warning', ['timeout']), ('critical', ['oom']), ('ok', []), ('critical', ['timeout'])]
+        >>> [(x.name, x.hits) for x in classify.rules]
+        [('OutOfMemory(Error)?', 1), ('(?:WARN|WARNING)\\\\b', 1), ('timed? ?out', 2), ('(?i)^panic', 0)]
+
+    """
+
+    def __init__(self, rules=(), report=60):
+        self.rules = [Rule(**x) for x in rules]
+        self.report = report
+        self.reported = None
+
+        # re has no multi-pattern matching, one alternation of them all is
+        # slower than a search per rule (see bench.py classify)
+        self.prefiltered = [rule for rule in self.rules if rule.literals is not None]
+        self.searched = [rule for rule in self.rules if rule.literals is None]
+
+    def match(self, log):
+        """The rules that match log"""
+        hits = []
+
+        for rule in self.prefiltered:
+            for literal in rule.literals:
+                if literal in log:
+                    if rule.regex.search(log):
+                        hits.append(rule)
+                    break
+
+        for rule in self.searched:
+            if rule.regex.search(log):
+                hits.append(rule)
+
+        # in the order of the rules
+        if len(hits) > 1:
+            hits.sort(key=self.rules.index)
+
+        return hits
+
+    def handle(self, events, now):
+        for event in events:
+            log = event['attributes'].get('log')
+            if not log:
+                continue
+
+            for rule in self.match(log):
+                rule.hits += 1
+
+                if rule.state is not None and SEVERITY[rule.state] > SEVERITY.get(event.get('state'), 0):
+                    event['state'] = rule.state
+
+                for tag in rule.tags:
+                    if tag not in event['tags']:
+                        event['tags'] = event['tags'] + [tag]
+
+        return events
+
+    def flush(self, now):
+        if self.reported is None:
+            self.reported = now
+
+        if now - self.reported >= self.report:
+            self.reported = now
+
+            print('classify', ', '.join('%s %d' % (rule.name, rule.hits) for rule in self.rules))
+
+        return []
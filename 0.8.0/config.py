@@ -0,0 +1,116 @@
+import copy
+import json
+import os
+
+__all__ = ['load']
+
+DEFAULTS = {
+    # container selection, see filters.py
+    'include': [],
+    'exclude': [],
+
+    # "api" follows /containers/<id>/logs, "file" tails json-file logs under logs_root
+    'logs': 'api',
+    'logs_root': '/var/lib/docker/containers',
+    # fold stack traces and other continuation lines into one event, e.g.
+    # {"pattern": "^\\s*\\}", "max_bytes": 65536, "timeout": 1.0}, see multiline.py
+    'logs_multiline': None,
+    # drop lines repeated within the last recent lines and send how many times
+    # they were, e.g. {"window": 60, "recent": 4}, see dedup.py
+    'logs_dedup': None,
+    # add template_id, template and params attributes, e.g. {"similarity": 0.4,
+    # "max_clusters": 1000, "count": ["label:events.logs.templates=count"]},
+    # containers matching count only send per template counts, see drain.py
+    'logs_drain': None,
+    # lift fields out of JSON log lines and set the state from their level, e.g.
+    # {"fields": {"level": ["level", "severity"], "msg": ["msg"]}, "levels": {"audit": "ok"}},
+    # {} is the defaults in jsonlog.py
+    'logs_json': None,
+    # set the state and tags of log events from their content, e.g. {"rules":
+    # [{"pattern": "OutOfMemoryError", "state": "critical", "tags": ["oom"]}], "report": 60},
+    # see classify.py
+    'logs_classify': None,
+    # metrics from log lines, e.g. {"rules": [{"pattern": "took (?P<value>\\d+)ms",
+    # "service": "request time", "match": ["image:^nginx"], "seconds": 10, "drop": true}]},
+    # see extract.py
+    'logs_extract': None,
+    # only count the lines, bytes and levels of containers labelled
+    # events.logs.volume=true or matching every match rule, see volume.py
+    'logs_volume': {'seconds': 60, 'match': []},
+    # token bucket per container, e.g. {"rate": 100, "burst": 1000, "report": 60},
+    # the events.logs.rate and events.logs.burst labels override it, see ratelimit.py
+    'logs_ratelimit': None,
+
+    # "api" follows /containers/<id>/stats, "cgroup" samples cgroupfs every stats_interval seconds
+    'stats': 'api',
+    'stats_interval': 1.0,
+    # stats services to emit, without the "container <name> " prefix, see
+    # riemann.compile, None is riemann.METRICS
+    'stats_metrics': None,
+    # decode only the parts of stats documents that are used
+    'stats_projection': False,
+    # also emit cpu percent and per second rates of the network and blkio counters
+    'stats_rates': False,
+    # aggregate stats events over windows of this many seconds, 0 is off,
+    # any of last, min, max and mean
+    'stats_window': 0,
+    'stats_window_aggregates': ['last', 'max'],
+    # only send stats that have changed, e.g. {"absolute": 0, "relative": 0.01, "heartbeat": 0.5},
+    # unchanged values are still sent every heartbeat * ttl seconds
+    'stats_deadband': None,
+    # poll containers that have been idle for a while instead of streaming their
+    # stats, e.g. {"interval": 30, "idle": 30, "cpu": 0.01, "memory": 0.01}, see
+    # adaptive.py, api stats only
+    'stats_adaptive': None,
+    # sum and max per image, label value and node, e.g.
+    # {"metrics": ["cpu percent", "memory usage"], "label": "team", "drop": ["label:priority=low"]},
+    # containers matching drop only count towards the rollups
+    'stats_rollup': None,
+    # "events" sends one event per metric, "document" one event per container
+    # sample with the metrics as attributes
+    'stats_mode': 'events',
+    # do each container's periodic work (checks, tails, polls) at its own
+    # point in the second rather than all of it at once, see wheel.py
+    'spread': False,
+    'cgroup_root': '/sys/fs/cgroup',
+    # network counters for the cgroup backend come from <proc_root>/<pid>/net/dev
+    'proc_root': '/proc',
+}
+
+
+def load(path=None):
+    """Load configuration
+
+    Settings are read from the JSON document at $EVENTS_CONFIG (default
+    /srv/events/config.json), anything missing falls back to DEFAULTS.
+    A document that isn't valid JSON stops the agent with the error.
+
+        >>> config = load('/nonexistent')
+        >>> config['include'], config['exclude']
+        ([], [])
+
+        >>> import tempfile
+        >>> with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+        ...     _ = f.write('{\\n    // comment\\n}')
+        ...     f.flush()
+        ...     load(f.name)  # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+        ...
+        SystemExit: config ....json: Expecting property name enclosed in double quotes: line 2 column 5 (char 6)
+
+    """
+    if path is None:
+        path = os.getenv('EVENTS_CONFIG', '/srv/events/config.json')
+
+    config = copy.deepcopy(DEFAULTS)
+
+    try:
+        with open(path) as f:
+            config.update(json.load(f))
+        print('config', path)
+    except FileNotFoundError:
+        pass
+    except ValueError as exc:
+        raise SystemExit('config %s: %s' % (path, exc))
+
+    return config
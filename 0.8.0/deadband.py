@@ -0,0 +1,86 @@
+import window
+
+__all__ = ['Deadband']
+
+
+class Deadband(object):
+    """Only pass on metric events whose value has changed
+
+    A value within absolute, or relative times the last value sent, of the
+    last value sent for its service is dropped, unless heartbeat times the
+    event ttl has gone by since, so the riemann index never expires it.
+
+        >>> deadband = Deadband(absolute=1, relative=0.1, heartbeat=0.5)
+        >>> def metric(x, now):
+        ...     return [e['metric_sint64'] for e in deadband.handle([{'service': 'foo', 'ttl': 60, 'metric_sint64': x}], now)]
+        >>> metric(100, 0), metric(101, 1), metric(109, 2), metric(111, 3)
+        ([100], [], [], [111])
+        >>> metric(111, 32), metric(111, 34)
+        ([], [111])
+        >>> metric(0, 35), metric(0, 36)
+        ([0], [])
+        >>> deadband.seen, deadband.suppressed, deadband.ratio()
+        (8, 4, 0.5)
+
+        >>> deadband.handle([{'service': 'container foo stdout'}], 37)
+        [{'service': 'container foo stdout'}]
+
+    """
+
+    def __init__(self, absolute=0, relative=0.0, heartbeat=0.5, report=60):
+        self.absolute = absolute
+        self.relative = relative
+        self.heartbeat = heartbeat
+        self.report = report
+
+        # service -> [value, sent, ttl]
+        self.last = {}
+
+        self.seen = 0
+        self.suppressed = 0
+        self.reported = None
+
+    def handle(self, events, now):
+        passed = []
+
+        for event in events:
+            for k in window.METRICS:
+                if k in event:
+                    break
+            else:
+                passed.append(event)
+                continue
+
+            v = event[k]
+            ttl = event.get('ttl', 60)
+
+            self.seen += 1
+
+            last = self.last.get(event['service'])
+            if last is not None and now - last[1] < self.heartbeat * ttl and abs(v - last[0]) <= max(self.absolute, self.relative * abs(last[0])):
+                self.suppressed += 1
+                continue
+
+            self.last[event['service']] = [v, now, ttl]
+            passed.append(event)
+
+        return passed
+
+    def ratio(self):
+        return float(self.suppressed) / self.seen if self.seen else 0.0
+
+    def flush(self, now):
+        if self.reported is None:
+            self.reported = now
+
+        if now - self.reported >= self.report:
+            self.reported = now
+
+            print('deadband', 'suppressed %d of %d (%.1f%%)' % (self.suppressed, self.seen, self.ratio() * 100.0))
+
+            # services that have stopped, e.g. the container has gone
+            for service, (_, sent, ttl) in list(self.last.items()):
+                if now - sent > ttl:
+                    del self.last[service]
+
+        return []
@@ -0,0 +1,110 @@
+import collections
+import re
+
+import riemann
+
+__all__ = ['Dedup']
+
+# times within the line itself, iso 8601, clock times and apache's 10/Oct/2000:13:55:36
+TIMES = re.compile(rb'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}[.,]?\d*|\d{2}:\d{2}:\d{2}[.,]?\d*|\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}')
+
+
+class Dedup(object):
+    """Suppress repeated log lines
+
+    A line the same, times aside, as one of the last recent different lines
+    of its container and stream is dropped and counted. The count is passed
+    on as the last of the repeated lines with attributes repeated, first and
+    last once the line has fallen out of the recent lines or every window
+    seconds while it keeps repeating.
+
+        >>> dedup = Dedup(window=60, recent=2)
+        >>> def record(second, log):
+        ...     return ('foo', 'stdout', ('2015-08-31T14:41:%02d.000000000Z %s\\n' % (second, log)).encode('utf-8'), None)
+        >>> lines = [record(0, 'GET /health 200'), record(1, 'retrying at 14:41:01'), record(2, 'GET /health 200'),
+        ...          record(3, 'retrying at 14:41:03'), record(4, 'GET /health 200'), record(5, 'started')]
+        >>> for container, stream, line, attributes in dedup.handle(lines, 0):
+        ...     print(line[31:-1].decode('utf-8'), attributes and sorted(attributes.items()))
+        GET /health 200 None
+        retrying at 14:41:01 None
+        started None
+        retrying at 14:41:03 [('first', '2015-08-31T14:41:01Z'), ('last', '2015-08-31T14:41:03Z'), ('repeated', '1')]
+        >>> dedup.flush(30)
+        []
+        >>> [sorted(x[3].items()) for x in dedup.flush(60)]
+        [[('first', '2015-08-31T14:41:00Z'), ('last', '2015-08-31T14:41:04Z'), ('repeated', '2')]]
+
+    """
+
+    def __init__(self, window=60, recent=4):
+        self.window = window
+        self.recent = recent
+
+        # (container, stream) -> hash of the line without its times -> [last line, first time, repeats, since, seen]
+        self.runs = {}
+
+    def handle(self, records, now):
+        passed = []
+
+        for container, stream, line, attributes in records:
+            m = riemann.TIMESTAMP.search(line)
+            if m is None or attributes is not None:
+                passed.append((container, stream, line, attributes))
+                continue
+
+            line = line[m.start():]
+            key = hash(TIMES.sub(b'', line[31:]))
+
+            runs = self.runs.get((container, stream))
+            if runs is None:
+                runs = self.runs[(container, stream)] = collections.OrderedDict()
+
+            run = runs.get(key)
+            if run is not None:
+                runs.move_to_end(key)
+                if run[1] is None:
+                    run[1] = line[:19]
+                run[0] = line
+                run[2] += 1
+                run[4] = now
+                continue
+
+            passed.append((container, stream, line, None))
+
+            runs[key] = [line, line[:19], 0, now, now]
+
+            if len(runs) > self.recent:
+                _, run = runs.popitem(last=False)
+                if run[2]:
+                    passed.append(self.summary(container, stream, run))
+
+        return passed
+
+    def summary(self, container, stream, run):
+        return (container, stream, run[0], {
+            'repeated': str(run[2]),
+            'first': run[1].decode('utf-8') + 'Z',
+            'last': run[0][:19].decode('utf-8') + 'Z',
+        })
+
+    def flush(self, now):
+        passed = []
+
+        for (container, stream), runs in list(self.runs.items()):
+            for key, run in list(runs.items()):
+                if now - run[3] < self.window:
+                    continue
+
+                if run[2]:
+                    passed.append(self.summary(container, stream, run))
+                    run[1] = None
+                    run[2] = 0
+                    run[3] = now
+                elif now - run[4] >= self.window:
+                    # nothing since, e.g. the container has gone
+                    del runs[key]
+
+            if not runs:
+                del self.runs[(container, stream)]
+
+        return passed
@@ -0,0 +1,368 @@
+import concurrent.futures
+import datetime
+import http.client
+import json
+import pickle
+import re
+import select
+import socket
+import urllib.parse
+
+__all__ = []
+
+
+class HTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self):
+        http.client.HTTPConnection.__init__(self, 'localhost')
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect('/var/run/docker.sock')
+        self.sock = sock
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+
+
+def get(path):
+    conn = HTTPConnection()
+    try:
+        conn.request('GET', path)
+        resp = conn.getresponse()
+
+        if resp.status != 200:
+            raise HTTPError(resp.status, resp.reason)
+    except Exception:
+        conn.close()
+        raise
+
+    try:
+        if resp.headers.get('Content-Type') == 'application/json':
+            return json.loads(resp.read().decode('utf-8'))
+        else:
+            return resp.read()
+    finally:
+        conn.close()
+
+
+class Stream(object):
+    """Streaming response read straight off the docker socket
+
+    The status line and headers are parsed here, everything after them is
+    left in `buffer` and handed out before anything read from the socket so
+    nothing is lost between the headers and the first epoll event.
+
+        >>> a, b = socket.socketpair()
+        >>> _ = b.sendall(b'HTTP/1.1 200 OK\\r\\nContent-Type: application/json\\r\\nTransfer-Encoding: chunked\\r\\n\\r\\n5\\r\\nhello\\r\\n')
+        >>> stream = Stream(a)
+        >>> stream.status, stream.reason, stream.chunked
+        (200, 'OK', True)
+        >>> stream.headers['content-type']
+        'application/json'
+        >>> stream.read()
+        b'5\\r\\nhello\\r\\n'
+        >>> stream.read() is None
+        True
+        >>> _ = b.sendall(b'0\\r\\n\\r\\n')
+        >>> buf = bytearray(16)
+        >>> n = stream.recv_into(buf)
+        >>> bytes(buf[:n])
+        b'0\\r\\n\\r\\n'
+        >>> b.close()
+        >>> stream.read()
+        b''
+        >>> stream.close()
+
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b''
+        self.headers = {}
+
+        while b'\r\n\r\n' not in self.buffer:
+            data = sock.recv(8192)
+            if not data:
+                raise http.client.BadStatusLine('')
+            self.buffer += data
+
+        head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+        lines = head.decode('iso-8859-1').split('\r\n')
+
+        version, status, reason = (lines[0].split(None, 2) + [''])[:3]
+        self.status = int(status)
+        self.reason = reason
+
+        for line in lines[1:]:
+            k, _, v = line.partition(':')
+            self.headers[k.strip().lower()] = v.strip()
+
+        self.chunked = self.headers.get('transfer-encoding', '').lower() == 'chunked'
+
+        sock.setblocking(False)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def recv_into(self, buf):
+        """Fill buf, leftover bytes first, return the number of bytes or None"""
+        if self.buffer:
+            n = min(len(buf), len(self.buffer))
+            buf[:n] = self.buffer[:n]
+            self.buffer = self.buffer[n:]
+            return n
+        try:
+            return self.sock.recv_into(buf)
+        except BlockingIOError:
+            return None
+
+    def read(self, size=8192):
+        """Read up to size bytes, b'' at end of stream, None if nothing is ready"""
+        if self.buffer:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+            return data
+        try:
+            return self.sock.recv(size)
+        except BlockingIOError:
+            return None
+
+    def close(self):
+        self.sock.close()
+
+
+def stream(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect('/var/run/docker.sock')
+        sock.sendall(('GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % path).encode('utf-8'))
+        resp = Stream(sock)
+
+        if resp.status != 200:
+            raise HTTPError(resp.status, resp.reason)
+    except Exception:
+        sock.close()
+        raise
+
+    return resp
+
+
+def containers(filters=None):
+    path = '/containers/json'
+    if filters:
+        path += '?filters=' + urllib.parse.quote(json.dumps(filters))
+
+    return [Container(c['Id'], c['Created'],
+                      name=(c.get('Names') or [''])[0].lstrip('/'),
+                      image=c.get('Image', ''),
+                      labels=c.get('Labels')) for c in get(path)]
+
+
+class Container(object):
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    # one-shot stats, see adaptive.py, docker takes a second or two over each
+    poller = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+    since = 0
+
+    def __init__(self, id_, created, name='', image='', labels=None):
+        self.id_ = id_
+        self.created = created
+
+        self.name = name
+        self.image = image
+        self.labels = labels or {}
+
+        self.logs = None
+        self.logs_fd = None
+        self.logs_resp = None
+        self.logs_stream = 'stdout'
+
+        # json-file backend, see jsonfile.py
+        self.tail = None
+        self.tail_wd = None
+
+        self.stats = None
+        self.stats_fd = None
+        self.stats_resp = None
+        self.stats_poll = None
+
+        self._info = None
+
+    def __repr__(self):
+        return "<Container %s created=%r>" % (self.id_, self.created)
+
+    def __str__(self):
+        return "%.12s" % self.id_
+
+    def __eq__(self, other):
+        if self.id_ == other.id_ and self.created == other.created:
+            return True
+
+    def __hash__(self):
+        return hash((self.id_, self.created))
+
+    def inspect(self):
+        return get('/containers/%s/json' % self.id_)
+
+    def logs_start(self, epoll):
+        try:
+            info = self.inspect()
+        except HTTPError as exc:
+            raise
+
+        url = '/containers/%s/logs?follow=1&stdout=1&stderr=1&since=%s&timestamps=1' % (self.id_, Container.since)
+
+        print(self, url)
+
+        self.logs = Container.executor.submit(stream, url)
+
+    def logs_stop(self, epoll):
+        if self.logs is None:
+            return
+
+        # Let's attempt to cancel the future just in case
+        self.logs.cancel()
+
+        try:
+            logs = self.logs.result(timeout=0)
+        except (concurrent.futures.CancelledError,
+                concurrent.futures.TimeoutError,
+                HTTPError) as exc:
+            print(self, 'logs', exc)
+            return
+
+        try:
+            fd = logs.fileno()
+            epoll.unregister(fd)
+            print(self, 'logs', "unregistered (fd=%s)." % fd)
+        except FileNotFoundError:
+            pass
+
+        logs.close()
+
+    def logs_check(self, epoll):
+        if self.logs is None or self.logs_fd is not None:
+            return
+
+        try:
+            logs = self.logs.result(timeout=0)
+        except (concurrent.futures.TimeoutError,
+                HTTPError) as exc:
+            print(self, 'logs', exc)
+            return
+
+        print(self, 'logs', logs)
+
+        self.logs_resp = logs
+        self.logs_fd = logs.fileno()
+
+        print(self, 'logs', self.logs_fd)
+
+        try:
+            epoll.register(self.logs_fd, select.EPOLLIN | select.EPOLLRDHUP)
+            print(self, 'logs', "registered (fd=%s)." % self.logs_fd)
+        except FileExistsError:
+            return
+
+    def stats_start(self, epoll):
+        try:
+            info = self.inspect()
+        except HTTPError as exc:
+            raise
+
+        url = '/containers/%s/stats' % self.id_
+
+        print(self, url)
+
+        self.stats = Container.executor.submit(stream, url)
+
+    def stats_stop(self, epoll):
+        if self.stats is None:
+            return
+
+        # Let's attempt to cancel the future just in case
+        self.stats.cancel()
+
+        try:
+            stats = self.stats.result(timeout=0)
+        except (concurrent.futures.CancelledError,
+                concurrent.futures.TimeoutError,
+                HTTPError) as exc:
+            print(self, 'stats', exc)
+            return
+
+        try:
+            fd = stats.fileno()
+            epoll.unregister(fd)
+            print(self, 'stats', "unregistered (fd=%s)." % fd)
+        except FileNotFoundError:
+            pass
+
+        stats.close()
+
+    def stats_once(self):
+        url = '/containers/%s/stats?stream=0' % self.id_
+
+        self.stats_poll = Container.poller.submit(get, url)
+
+    def stats_check(self, epoll):
+        if self.stats is None or self.stats_fd is not None:
+            return
+
+        try:
+            stats = self.stats.result(timeout=0)
+        except (concurrent.futures.TimeoutError,
+                HTTPError) as exc:
+            print(self, 'stats', exc)
+            return
+
+        print(self, 'stats', stats)
+
+        self.stats_resp = stats
+        self.stats_fd = stats.fileno()
+
+        print(self, 'stats', self.stats_fd)
+
+        try:
+            epoll.register(self.stats_fd, select.EPOLLIN | select.EPOLLRDHUP)
+            print(self, 'stats', "registered (fd=%s)." % self.stats_fd)
+        except FileExistsError:
+            return
+
+
+def parse(data):
+    """Parse stream
+
+        >>> parse(b'80\\r\\n{"status":"create","id":"46e344569d70e9cf849a217701d5ef2e866dff122c1d5f1641b490e680c15c5d","from":"centos:7","time":1445856406}\\n\\r\\n')
+        (b'', b'{"status":"create","id":"46e344569d70e9cf849a217701d5ef2e866dff122c1d5f1641b490e680c15c5d","from":"centos:7","time":1445856406}\\n')
+
+        >>> parse(b'80\\r\\n{"status":"create","id":"46e344569d70e9cf849a217701d5ef2e866dff122c1d5f1641b490e680c15c5d","from":"centos:7","time":1445856406}\\n')
+        (b'80\\r\\n{"status":"create","id":"46e344569d70e9cf849a217701d5ef2e866dff122c1d5f1641b490e680c15c5d","from":"centos:7","time":1445856406}\\n', b'')
+
+        >>> parse(b'80\\r\\n{"status":"create","id":"46e344569d70e9cf849a217701d5ef2e866dff122c1d5f1641b490e680c15c5d","from":"centos:7"')
+        (b'80\\r\\n{"status":"create","id":"46e344569d70e9cf849a217701d5ef2e866dff122c1d5f1641b490e680c15c5d","from":"centos:7"', b'')
+
+    """
+    if not re.match(rb'[0-9a-f]+\r\n.*\r\n', data, re.I|re.S):
+        return data, b''
+
+    i = data.find(b'\r\n')
+
+    x = data[:i]
+    y = int(x, 16)
+
+    data = data[i + 2:]
+    if len(data) < y + 2:
+        return data, b''
+
+    line = data[:y]
+    data = data[y + 2:]
+
+    return data, line
@@ -0,0 +1,215 @@
+import collections
+import json
+import re
+import time
+
+import filters
+import riemann
+
+__all__ = ['Drain']
+
+WILDCARD = b'<*>'
+
+DIGIT = re.compile(rb'\d')
+
+
+class Cluster(object):
+
+    __slots__ = ['id_', 'tokens', 'leaf']
+
+    def __init__(self, id_, tokens, leaf):
+        self.id_ = id_
+        self.tokens = tokens
+        self.leaf = leaf
+
+    def template(self):
+        return b' '.join(self.tokens).decode('utf-8', 'replace')
+
+
+class Drain(object):
+    """Mine log templates online, after Drain (He et al, ICWS 2017)
+
+    Lines are split on whitespace, a token with a digit in it is taken for
+    a parameter from the start, and go down a fixed depth tree, by their
+    number of tokens then by their first depth - 2 tokens, to a leaf of
+    templates. The
+    line joins the most similar template there if at least similarity of
+    the tokens match, the tokens that differ becoming <*>, or starts its
+    own. A node has at most max_children children, lines are cut to
+    max_tokens and the least recently seen templates are forgotten past
+    max_clusters, so both the work per line and the memory are bounded.
+
+    Events get template_id, template and params (a JSON list) attributes,
+    the lines of containers matching the count rules (see filters.py) are
+    only counted, every window seconds each count is sent as "container
+    <name> <stream> template <id>" (see report).
+
+        >>> drain = Drain()
+        >>> lines = [('2015-08-31T14:41:43.702708748Z connected to 10.0.0.%d in %dms\\n' % (i, i * 3)).encode('utf-8') for i in (1, 2)]
+        >>> for container, stream, line, attributes in drain.handle([('foo', 'stdout', line, None) for line in lines], 0):
+        ...     print(attributes['template_id'], attributes['template'], attributes['params'])
+        1 connected to <*> in <*> ["10.0.0.1", "3ms"]
+        1 connected to <*> in <*> ["10.0.0.2", "6ms"]
+
+        >>> import docker
+        >>> drain = Drain(count=['label:events.logs.templates=count'], window=60)
+        >>> container = docker.Container('123', 1, name='foo', labels={'events.logs.templates': 'count'})
+        >>> container._info = {'Id': '123', 'Image': '', 'Name': '/foo', 'Config': {'Image': '', 'Cmd': [], 'Entrypoint': ''}}
+        >>> drain.handle([(container, 'stdout', line, None) for line in lines], 0)
+        []
+        >>> [(x['service'], x['metric_sint64'], x['attributes']['template']) for x in drain.report(0) + drain.report(60)]
+        [('container foo stdout template 1', 2, 'connected to <*> in <*>')]
+
+    """
+
+    def __init__(self, depth=4, similarity=0.4, max_children=100, max_tokens=64, max_clusters=1000, count=(), window=60):
+        self.depth = depth
+        self.similarity = similarity
+        self.max_children = max_children
+        self.max_tokens = max_tokens
+        self.max_clusters = max_clusters
+
+        self.count = filters.Filter(include=count) if count else None
+        self.window = window
+        self.start = None
+
+        # number of tokens -> token -> ... -> [clusters]
+        self.root = {}
+
+        # id -> cluster, least recently seen first
+        self.clusters = collections.OrderedDict()
+        self.next_id = 1
+
+        # container -> counted, when count rules are given
+        self.counted = {}
+
+        # (container, stream, cluster id) -> [cluster, lines]
+        self.counts = {}
+
+    def mine(self, payload):
+        """The cluster of payload and its parameters, None for a blank line"""
+        tokens = payload.split()
+        if not tokens:
+            return None, []
+
+        if len(tokens) > self.max_tokens:
+            tokens = tokens[:self.max_tokens - 1] + [b' '.join(tokens[self.max_tokens - 1:])]
+
+        masked = [WILDCARD if DIGIT.search(x) else x for x in tokens]
+
+        node = self.root.setdefault(len(tokens), {})
+
+        for key in masked[:self.depth - 2]:
+            child = node.get(key)
+            if child is None:
+                if len(node) >= self.max_children:
+                    key = WILDCARD
+                    child = node.get(key)
+                if child is None:
+                    child = node[key] = {}
+            node = child
+
+        leaf = node.setdefault(None, [])
+
+        best = None
+        best_sim = -1.0
+
+        for cluster in leaf:
+            same = sum(1 for a, b in zip(cluster.tokens, masked) if a == b)
+            sim = float(same) / len(tokens)
+            if sim > best_sim:
+                best, best_sim = cluster, sim
+
+        if best is not None and best_sim >= self.similarity:
+            best.tokens = [a if a == b else WILDCARD for a, b in zip(best.tokens, masked)]
+            self.clusters.move_to_end(best.id_)
+        else:
+            best = Cluster(self.next_id, masked, leaf)
+            self.next_id += 1
+
+            leaf.append(best)
+            self.clusters[best.id_] = best
+
+            if len(self.clusters) > self.max_clusters:
+                _, old = self.clusters.popitem(last=False)
+                old.leaf.remove(old)
+
+        return best, [b for a, b in zip(best.tokens, tokens) if a == WILDCARD]
+
+    def counting(self, container):
+        if self.count is None:
+            return False
+
+        counted = self.counted.get(container)
+        if counted is None:
+            counted = self.counted[container] = self.count.match(container.name, container.image, container.labels)
+
+        return counted
+
+    def handle(self, records, now):
+        passed = []
+
+        for container, stream, line, attributes in records:
+            m = riemann.TIMESTAMP.search(line)
+            if m is None or attributes is not None:
+                passed.append((container, stream, line, attributes))
+                continue
+
+            cluster, params = self.mine(line[m.start() + 31:])
+            if cluster is None:
+                passed.append((container, stream, line, attributes))
+                continue
+
+            if self.counting(container):
+                key = (container, stream, cluster.id_)
+                c = self.counts.get(key)
+                if c is None:
+                    self.counts[key] = [cluster, 1]
+                else:
+                    c[1] += 1
+                continue
+
+            passed.append((container, stream, line, {
+                'template_id': str(cluster.id_),
+                'template': cluster.template(),
+                'params': json.dumps([x.decode('utf-8', 'replace') for x in params]),
+            }))
+
+        return passed
+
+    def flush(self, now):
+        return []
+
+    def report(self, now):
+        """Events of the template counts, every window seconds"""
+        if self.start is None:
+            self.start = now
+
+        if now - self.start < self.window:
+            return []
+
+        self.start = now
+
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))
+
+        events = []
+
+        for (container, stream, id_), (cluster, n) in sorted(self.counts.items(), key=lambda x: x[0][2]):
+            info = container._info
+
+            events.append({
+                'time': int(now),
+                'state': 'ok',
+                'service': 'container %s %s template %d' % (info['Name'].lstrip('/'), stream, id_),
+                'tags': [],
+                'ttl': 2 * self.window,
+                'attributes': dict(riemann.container_attributes(info, timestamp), template_id=str(id_), template=cluster.template()),
+                'metric_sint64': n,
+            })
+
+        self.counts = {}
+
+        # containers that have gone
+        self.counted = {}
+
+        return events
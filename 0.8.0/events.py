@@ -0,0 +1,664 @@
+#!/usr/local/bin/python3
+
+import json
+import os
+import re
+import select
+import time
+
+import adaptive
+import cgroup
+import classify
+import config
+import deadband
+import dedup
+import docker
+import drain
+import extract
+import filters
+import flatten
+import jsonfile
+import jsonlog
+import multiline
+import netdev
+import project
+import ratelimit
+import rates
+import riemann
+import rollup
+import volume
+import wheel
+import window
+
+import riemann_client.client
+import riemann_client.transport
+
+buf = bytearray(65536)
+
+projection = None
+
+# compiled stats_metrics
+metrics = riemann.DEFAULT
+
+# counter state, when rates are enabled
+rates_ = None
+
+# what stats events go through on their way out, see main
+stages = []
+
+rollup_ = None
+
+# what log lines go through before they become events, see main
+log_stages = []
+
+# what log events go through on their way out, see main
+log_event_stages = []
+
+# log templates, when mined
+drain_ = None
+
+# json log lines, when fields are lifted from them
+jsonlog_ = None
+
+# log to metric rules
+extract_ = None
+
+# containers whose log lines are only counted
+volume_ = None
+
+# token buckets, when log lines are rate limited
+ratelimit_ = None
+
+# stats stream or polls per container, when adaptive
+adaptive_ = None
+
+
+def handle_log(client, container, line, stream=None):
+    if stream is None:
+        if len(line) == 8:
+            container.logs_stream = 'stdout' if line[0] == 1 else 'stderr'
+            return
+        stream = container.logs_stream
+
+    if volume_ is not None and volume_.handle(container, stream, line):
+        return
+
+    if ratelimit_ is not None and not ratelimit_.allow(container.id_, time.time()):
+        return
+
+    # on raw lines, before they are folded, suppressed or only counted
+    if extract_ is not None:
+        values, keep = extract_.handle(container, line, time.time())
+        send(client, values)
+        if not keep:
+            return
+
+    # (container, stream, line, attributes), attributes are added to the event
+    records = [(container, stream, line, None)]
+
+    if log_stages:
+        now = time.time()
+        for stage in log_stages:
+            records = stage.handle(records, now)
+
+    handle_records(client, records)
+
+
+def handle_records(client, records):
+    events = []
+
+    now = time.time()
+
+    for container, stream, line, attributes in records:
+        for event in riemann.handle_log(line, container._info, stream):
+            if attributes is not None:
+                event['attributes'].update(attributes)
+            events.append(event)
+
+    for stage in log_event_stages:
+        events = stage.handle(events, now)
+
+    send(client, events)
+
+
+def flush_log_stages(client):
+    """Pass on whatever the log stages have due"""
+    now = time.time()
+
+    records = []
+    for stage in log_stages:
+        records = stage.handle(records, now) + stage.flush(now)
+
+    handle_records(client, records)
+
+    events = []
+    for stage in log_event_stages:
+        events = stage.handle(events, now) + stage.flush(now)
+
+    send(client, events)
+
+
+def handle_stat(client, container, line):
+    if projection is not None:
+        data = projection.loads(line)
+    else:
+        data = json.loads(line.decode('utf-8'))
+
+    handle_sample(client, container, data)
+
+
+def handle_sample(client, container, data):
+    if adaptive_ is not None:
+        adaptive_.handle(container.id_, data, time.time())
+
+    events = riemann.handle_stat(data, container._info, metrics)
+
+    if rates_ is not None:
+        events.extend(rates_.handle(data, container._info))
+
+    handle_stat_events(client, events)
+
+
+def handle_adaptive(client, container, epoll, buffy):
+    """Move the container between the stats stream and polls as needed"""
+    now = time.time()
+
+    change = adaptive_.check(container.id_, now)
+
+    if change == 'poll':
+        container.stats_stop(epoll)
+        forget(container, 'stats', container.stats_fd, buffy)
+        container.stats = container.stats_fd = container.stats_resp = None
+    elif change == 'stream':
+        try:
+            container.stats_start(epoll)
+        except docker.HTTPError as exc:
+            print(container, exc)
+
+    if change is not None:
+        print(container, 'stats', change)
+        send(client, [adaptive_.event(container._info, now)])
+
+    if container.stats_poll is not None and container.stats_poll.done():
+        poll, container.stats_poll = container.stats_poll, None
+        try:
+            data = poll.result()
+        except (docker.HTTPError, OSError) as exc:
+            print(container, 'stats', exc)
+        else:
+            handle_sample(client, container, data)
+            if adaptive_.mode(container.id_) == 'poll':
+                send(client, [adaptive_.event(container._info, now)])
+
+    if container.stats_poll is None and adaptive_.due(container.id_, now):
+        container.stats_once()
+
+
+def handle_container(client, container, epoll, buffy, checkpoints):
+    """A container's periodic work, every tick or on its own timer"""
+    if container.tail is not None:
+        handle_tail(client, container)
+        checkpoints[container.id_] = container.tail.checkpoint()
+    else:
+        container.logs_check(epoll)
+    if container.stats is not None:
+        container.stats_check(epoll)
+    if adaptive_ is not None and container.id_ in adaptive_.containers:
+        handle_adaptive(client, container, epoll, buffy)
+
+    # bytes that arrived with the headers won't wake epoll
+    if container.logs_resp is not None and container.logs_resp.buffer:
+        handle_fd(client, container, container.logs_fd, buffy)
+    if container.stats_resp is not None and container.stats_resp.buffer:
+        handle_fd(client, container, container.stats_fd, buffy)
+
+
+def handle_tail(client, container):
+    for line in container.tail.read():
+        stream, line = jsonfile.parse(line)
+        if line is None:
+            continue
+
+        handle_log(client, container, line, stream)
+
+
+def handle_fd(client, container, fd, buffy):
+    """Read and handle whatever is ready on fd
+
+    Returns None when nothing was ready, False when data was handled and
+    True at the end of the stream.
+    """
+    resp = container.logs_resp if fd == container.logs_fd else container.stats_resp
+
+    n = resp.recv_into(buf)
+    if n is None:
+        return None
+    if n == 0:
+        return True
+
+    data = buffy.get(fd, b'') + buf[:n]
+
+    while 1:
+        # terminating chunk
+        if data.startswith(b'0\r\n\r\n'):
+            buffy[fd] = data[5:]
+            return True
+
+        data, line = docker.parse(data)
+        if not line:
+            break
+
+        if fd == container.logs_fd:
+            handle_log(client, container, line)
+        if fd == container.stats_fd:
+            handle_stat(client, container, line)
+
+        if not data:
+            break
+
+    buffy[fd] = data
+
+    return False
+
+
+def handle_stat_events(client, events):
+    now = time.time()
+
+    for stage in stages:
+        events = stage.handle(events, now)
+
+    send(client, events)
+
+
+def flush_stages(client):
+    """Pass on whatever the stats stages have due"""
+    now = time.time()
+
+    events = []
+    for stage in stages:
+        events = stage.handle(events, now) + stage.flush(now)
+
+    send(client, events)
+
+
+def send(client, events):
+    for event in events:
+        client.event(**event)
+
+    if events:
+        client.flush()
+
+
+def stream_end(container, fd, epoll, buffy):
+    if fd == container.logs_fd:
+        container.logs_stop(epoll)
+        forget(container, 'logs', fd, buffy)
+        container.logs = container.logs_fd = container.logs_resp = None
+    else:
+        container.stats_stop(epoll)
+        forget(container, 'stats', fd, buffy)
+        container.stats = container.stats_fd = container.stats_resp = None
+
+    print(container, 'end of stream (fd=%s).' % fd)
+
+
+def forget(container, name, fd, buffy):
+    if fd is not None:
+        if buffy.get(fd):
+            print(container, name, 'remaining', summarise(repr(buffy[fd])))
+        try:
+            del buffy[fd]
+        except KeyError:
+            pass
+
+
+def save_since():
+    docker.Container.since = int(time.time()) - 10
+    with open('/srv/events/since', 'w') as f:
+        print(docker.Container.since, file=f)
+
+
+def summarise(line, width=60):
+    """Summarise
+
+        >>> summarise('hi')
+        'hi'
+
+        >>> summarise('hi ' * 100)
+        'hi hi hi hi hi hi hi hi hi hi hi hi hi hi hi hi hi hi hi hi ...'
+
+    """
+    return line[:width] + '...' if len(line) > width else line[:width]
+
+
+def main():
+    global projection, metrics, rates_, rollup_, adaptive_, ratelimit_, drain_, jsonlog_, extract_, volume_
+
+    riemann_host = os.getenv('RIEMANN_HOST', 'localhost')
+    riemann_port = int(os.getenv('RIEMANN_PORT', '5555'))
+
+    config_ = config.load()
+
+    filter_ = filters.Filter(config_['include'], config_['exclude'])
+
+    if config_['stats_metrics'] is not None:
+        metrics = riemann.compile(config_['stats_metrics'])
+
+    if config_['stats_projection']:
+        paths = metrics.paths + (rates.PATHS if config_['stats_rates'] else [])
+        if config_['stats_adaptive'] is not None:
+            paths = paths + adaptive.PATHS
+        projection = project.Projection(paths)
+
+    if config_['stats_rates']:
+        rates_ = rates.Rates()
+
+    if config_['logs_multiline'] is not None:
+        log_stages.append(multiline.Multiline(**config_['logs_multiline']))
+
+    if config_['logs_dedup'] is not None:
+        log_stages.append(dedup.Dedup(**config_['logs_dedup']))
+
+    if config_['logs_drain'] is not None:
+        drain_ = drain.Drain(**config_['logs_drain'])
+        log_stages.append(drain_)
+
+    if config_['logs_json'] is not None:
+        jsonlog_ = jsonlog.JSONLog(**config_['logs_json'])
+        log_event_stages.append(jsonlog_)
+
+    if config_['logs_classify'] is not None:
+        log_event_stages.append(classify.Classify(**config_['logs_classify']))
+
+    if config_['logs_volume'] is not None:
+        volume_ = volume.Volume(**config_['logs_volume'])
+
+    if config_['logs_extract'] is not None:
+        extract_ = extract.Extract(**config_['logs_extract'])
+
+    if config_['logs_ratelimit'] is not None:
+        ratelimit_ = ratelimit.RateLimit(**config_['logs_ratelimit'])
+
+    if config_['stats_adaptive'] is not None:
+        adaptive_ = adaptive.Adaptive(**config_['stats_adaptive'])
+
+    if config_['stats_rollup'] is not None:
+        rollup_ = rollup.Rollup(**config_['stats_rollup'])
+        stages.append(rollup_)
+
+    if config_['stats_window']:
+        stages.append(window.Window(config_['stats_window'], config_['stats_window_aggregates']))
+
+    if config_['stats_deadband'] is not None:
+        stages.append(deadband.Deadband(**config_['stats_deadband']))
+
+    if config_['stats_mode'] == 'document':
+        stages.append(flatten.Flatten())
+
+    containers1 = []
+
+    # containers we decided not to attach to, so they are only looked at once
+    ignored = []
+
+    epoll = select.epoll()
+
+    start = 0
+
+    buffy = {}
+
+    # per container timers, when spread
+    wheel_ = None
+    timers = {}
+
+    if config_['spread']:
+        wheel_ = wheel.Wheel(now=time.time())
+
+    # json-file backend
+    inotify = None
+    watches = {}
+    checkpoints = {}
+
+    if config_['logs'] == 'file':
+        try:
+            inotify = jsonfile.Inotify()
+            epoll.register(inotify.fileno(), select.EPOLLIN)
+        except (AttributeError, OSError) as exc:
+            # no inotify, the tails are still read every tick
+            print('inotify', exc)
+            inotify = None
+
+        checkpoints = jsonfile.load('/srv/events/checkpoints')
+
+    # cgroup backend
+    sampler = None
+    network = None
+
+    if config_['stats'] == 'cgroup':
+        sampler = cgroup.Sampler(config_['cgroup_root'], config_['stats_interval'])
+        network = netdev.Sampler(config_['proc_root'], config_['stats_interval'])
+
+    try:
+        with open('/srv/events/since') as f:
+            docker.Container.since = int(f.read().rstrip())
+        print('since', docker.Container.since)
+    except FileNotFoundError:
+        pass
+    except ValueError:
+        pass
+
+    with riemann_client.client.QueuedClient(riemann_client.transport.TCPTransport(riemann_host, riemann_port)) as client:
+
+        while 1:
+
+            # tight loops are bad mmkay
+            time.sleep(0.05)
+
+            if wheel_ is not None:
+                wheel_.advance(time.time())
+
+            if sampler is not None:
+                samples = sampler.sample(time.time())
+                if samples:
+                    networks = dict(network.sweep())
+                    for container, data in samples:
+                        if container in networks:
+                            data['network'] = networks[container]
+                        handle_sample(client, container, data)
+
+            if time.time() - start >= 1.0:
+                start = time.time()
+
+                flush_stages(client)
+                flush_log_stages(client)
+
+                if drain_ is not None:
+                    send(client, drain_.report(time.time()))
+
+                if extract_ is not None:
+                    send(client, extract_.flush(time.time()))
+
+                if volume_ is not None:
+                    send(client, volume_.flush(time.time()))
+
+                if ratelimit_ is not None:
+                    send(client, ratelimit_.flush(time.time(), dict((x.id_, x._info) for x in containers1)))
+
+                containers2 = docker.containers(filter_.params())
+
+                ignored = [x for x in ignored if x in containers2]
+
+                a = [x for x in containers1 if x not in containers2]
+                b = [x for x in containers2 if x not in containers1 and x not in ignored]
+
+                for container in a:
+                    print('remove', container)
+
+                    if container in timers:
+                        wheel_.cancel(timers.pop(container))
+
+                    if container.tail is not None:
+                        handle_tail(client, container)
+                        if container.tail_wd is not None:
+                            inotify.rm_watch(container.tail_wd)
+                            del watches[container.tail_wd]
+                        container.tail.close()
+                        checkpoints.pop(container.id_, None)
+
+                    container.logs_stop(epoll)
+                    forget(container, 'logs', container.logs_fd, buffy)
+
+                    container.stats_stop(epoll)
+                    forget(container, 'stats', container.stats_fd, buffy)
+
+                    if sampler is not None:
+                        sampler.remove(container)
+                        network.remove(container)
+
+                    if rates_ is not None:
+                        rates_.forget(container.id_)
+
+                    if rollup_ is not None:
+                        rollup_.remove(container.id_)
+
+                    if adaptive_ is not None:
+                        adaptive_.forget(container.id_)
+
+                    if ratelimit_ is not None:
+                        ratelimit_.forget(container.id_)
+
+                    if jsonlog_ is not None:
+                        jsonlog_.forget(container.id_)
+
+                    if extract_ is not None:
+                        extract_.forget(container.id_)
+
+                    if volume_ is not None:
+                        volume_.forget(container.id_)
+
+                    containers1.remove(container)
+
+                for container in b:
+
+                    if not filter_.match(container.name, container.image, container.labels):
+                        print('ignore', container)
+                        ignored.append(container)
+                        continue
+
+                    try:
+                        info = container.inspect()
+                    except docker.HTTPError:
+                        continue
+
+                    container._info = info
+
+                    if info['Config']['Tty']:
+                        ignored.append(container)
+                        continue
+
+                    print('append', container)
+
+                    if config_['logs'] == 'file' and info['HostConfig']['LogConfig']['Type'] == 'json-file':
+                        path = os.path.join(config_['logs_root'], container.id_, container.id_ + '-json.log')
+                        try:
+                            container.tail = jsonfile.Tail(path, checkpoints.get(container.id_))
+                        except OSError as exc:
+                            print(container, exc)
+                            continue
+
+                        print(container, 'tail', path, container.tail.offset)
+
+                        if inotify is not None:
+                            container.tail_wd = inotify.add_watch(os.path.dirname(path), jsonfile.IN_MODIFY | jsonfile.IN_CREATE | jsonfile.IN_MOVED_TO)
+                            watches[container.tail_wd] = container
+                    else:
+                        try:
+                            container.logs_start(epoll)
+                        except docker.HTTPError as exc:
+                            print(container, exc)
+                            continue
+
+                    if sampler is not None:
+                        try:
+                            sampler.add(container, container.id_)
+                        except FileNotFoundError as exc:
+                            # fall back to the API
+                            print(container, exc)
+                        try:
+                            network.add(container, info['State']['Pid'])
+                        except OSError as exc:
+                            print(container, 'netdev', exc)
+
+                    if sampler is None or container not in sampler.stats:
+                        try:
+                            container.stats_start(epoll)
+                        except docker.HTTPError as exc:
+                            print(container, exc)
+                            continue
+
+                        if adaptive_ is not None:
+                            adaptive_.add(container.id_)
+
+                    if rollup_ is not None:
+                        rollup_.add(info)
+
+                    if ratelimit_ is not None:
+                        ratelimit_.add(container.id_, info['Config'].get('Labels') or {})
+
+                    if extract_ is not None:
+                        extract_.add(container)
+
+                    if volume_ is not None:
+                        volume_.add(container)
+
+                    containers1.append(container)
+
+                    if wheel_ is not None:
+                        timers[container] = wheel_.every(1.0, handle_container, client, container, epoll, buffy, checkpoints)
+
+                if wheel_ is None:
+                    for container in containers1:
+                        handle_container(client, container, epoll, buffy, checkpoints)
+
+                #
+                save_since()
+                #print('since', docker.Container.since)
+
+                if config_['logs'] == 'file':
+                    jsonfile.save('/srv/events/checkpoints', checkpoints)
+
+            #
+            for fd, event in epoll.poll(0):
+
+                if inotify is not None and fd == inotify.fileno():
+                    for wd in set(x[0] for x in inotify.read()):
+                        if wd in watches:
+                            handle_tail(client, watches[wd])
+                    continue
+
+                container = None
+                try:
+                    container = [x for x in containers1 if x.logs_fd and x.logs_fd == fd][0]
+                except IndexError:
+                    pass
+                try:
+                    container = [x for x in containers1 if x.stats_fd and x.stats_fd == fd][0]
+                except IndexError:
+                    pass
+
+                assert container is not None
+
+                ended = handle_fd(client, container, fd, buffy)
+
+                # the peer has gone, drain what is left rather than wait for epoll
+                if event & (select.EPOLLHUP | select.EPOLLRDHUP):
+                    while ended is False:
+                        ended = handle_fd(client, container, fd, buffy)
+                    ended = True
+
+                if ended:
+                    stream_end(container, fd, epoll, buffy)
+                    save_since()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import re
+import time
+
+import filters
+import rates
+import riemann
+import window
+
+__all__ = ['Extract']
+
+
+class Rule(object):
+
+    def __init__(self, pattern, service, match=(), seconds=0, aggregates=('mean', 'max'), drop=False):
+        self.regex = re.compile(pattern.encode('utf-8'))
+        if 'value' not in self.regex.groupindex:
+            raise ValueError(pattern)
+
+        self.service = service
+        self.filter = filters.Filter(include=match)
+        self.window = window.Window(seconds, aggregates) if seconds else None
+        self.drop = drop
+
+
+class Extract(object):
+    """Turn numbers in log lines into metric events
+
+    Rules are {"pattern": regex with a value group, "service": name} and
+    optionally match (container rules, see filters.py), seconds (to
+    aggregate over, see window.py, 0 sends every value), aggregates and
+    drop (don't send the lines a value came from). Lines are looked at as
+    they are read, before the log stages fold, suppress or count them, so
+    a dropped line doesn't reach them either. Which rules apply to a
+    container is worked out once, when it is added.
+
+        >>> import docker
+        >>> extract = Extract([
+        ...     {'pattern': r'took (?P<value>\\d+)ms', 'service': 'request time', 'match': ['image:^nginx'], 'drop': True},
+        ...     {'pattern': r'queue=(?P<value>\\d+)', 'service': 'queue size', 'seconds': 10, 'aggregates': ['max']},
+        ... ])
+        >>> info = {'Id': '123', 'Image': '', 'Name': '/foo', 'Config': {'Image': 'nginx:1.9', 'Cmd': [], 'Entrypoint': ''}}
+        >>> container = docker.Container('123', 1, name='foo', image='nginx:1.9')
+        >>> container._info = info
+        >>> extract.add(container)
+        >>> events, keep = extract.handle(container, b'2015-08-31T14:41:43.702708748Z GET / took 12ms queue=3\\n', 100)
+        >>> [(x['service'], x['metric_d'], x['time']) for x in events], keep
+        ([('container foo request time', 12.0, 1441032103)], False)
+        >>> extract.handle(container, b'2015-08-31T14:41:44.702708748Z queue=7\\n', 101)
+        ([], True)
+        >>> [(x['service'], x['metric_d']) for x in extract.flush(105) + extract.flush(110)]
+        [('container foo queue size max', 7.0)]
+
+    """
+
+    def __init__(self, rules=()):
+        self.rules = [Rule(**x) for x in rules]
+
+        # container id -> [rules]
+        self.containers = {}
+
+    def add(self, container):
+        rules = [rule for rule in self.rules if rule.filter.match(container.name, container.image, container.labels)]
+        if rules:
+            self.containers[container.id_] = rules
+
+    def forget(self, id_):
+        self.containers.pop(id_, None)
+
+    def handle(self, container, line, now):
+        """Metric events of line and whether to keep the line"""
+        rules = self.containers.get(container.id_)
+        if rules is None:
+            return [], True
+
+        events = []
+        keep = True
+
+        for rule in rules:
+            m = rule.regex.search(line)
+            if m is None:
+                continue
+
+            try:
+                value = float(m.group('value'))
+            except ValueError:
+                continue
+
+            if rule.drop:
+                keep = False
+
+            t = riemann.TIMESTAMP.search(line)
+            read = t.group().decode('utf-8').rstrip() if t is not None else time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))
+
+            event = {
+                'time': int(rates.timestamp(read)),
+                'state': 'ok',
+                'service': 'container %s %s' % (container._info['Name'].lstrip('/'), rule.service),
+                'tags': [],
+                'ttl': 60,
+                'attributes': riemann.container_attributes(container._info, read.split('.')[0].rstrip('Z') + 'Z'),
+                'metric_d': value,
+            }
+
+            if rule.window is not None:
+                rule.window.handle([event], now)
+            else:
+                events.append(event)
+
+        return events, keep
+
+    def flush(self, now):
+        events = []
+
+        for rule in self.rules:
+            if rule.window is not None:
+                events.extend(rule.window.flush(now))
+
+        return events
@@ -0,0 +1,76 @@
+import re
+
+__all__ = ['Filter']
+
+
+class Filter(object):
+    """Container include/exclude rules
+
+    Rules are strings of the form "label:key", "label:key=value",
+    "name:regex" or "image:regex". A container is kept when it matches every
+    include rule and none of the exclude rules. Include label rules have the
+    same semantics as the docker API label filter, so they are pushed to the
+    daemon, everything else is evaluated here once per container.
+
+        >>> f = Filter(include=['label:team=web', 'name:^api'], exclude=['image:pause'])
+        >>> f.params()
+        {'label': ['team=web']}
+
+        >>> f.match('api-1', 'nginx:1.9', {'team': 'web'})
+        True
+        >>> f.match('api-2', 'k8s/pause:2.0', {'team': 'web'})
+        False
+        >>> f.match('worker', 'nginx:1.9', {'team': 'web'})
+        False
+        >>> f.match('api-3', 'nginx:1.9', {'team': 'db'})
+        False
+
+        >>> Filter(exclude=['label:infra']).match('x', 'y', {'infra': ''})
+        False
+
+        >>> Filter(include=['bogus:x'])
+        Traceback (most recent call last):
+        ...
+        ValueError: bogus:x
+
+    """
+
+    def __init__(self, include=(), exclude=()):
+        self.include = [self.compile(x) for x in include]
+        self.exclude = [self.compile(x) for x in exclude]
+
+    @staticmethod
+    def compile(rule):
+        kind, _, value = rule.partition(':')
+
+        if kind == 'label':
+            k, sep, v = value.partition('=')
+            return (kind, value, lambda name, image, labels: k in labels and (not sep or labels[k] == v))
+
+        if kind == 'name':
+            r = re.compile(value)
+            return (kind, value, lambda name, image, labels: r.search(name) is not None)
+
+        if kind == 'image':
+            r = re.compile(value)
+            return (kind, value, lambda name, image, labels: r.search(image) is not None)
+
+        raise ValueError(rule)
+
+    def params(self):
+        """Docker API filters"""
+        labels = [value for kind, value, _ in self.include if kind == 'label']
+        return {'label': labels} if labels else {}
+
+    def match(self, name, image, labels):
+        labels = labels or {}
+
+        for _, _, f in self.include:
+            if not f(name, image, labels):
+                return False
+
+        for _, _, f in self.exclude:
+            if f(name, image, labels):
+                return False
+
+        return True
@@ -0,0 +1,77 @@
+import window
+
+__all__ = ['Flatten']
+
+
+class Flatten(object):
+    """Fold each container's metric events into one document event
+
+    Every metric becomes an attribute named after its service, e.g.
+    "container foo memory usage" is memory_usage, as in the stats document
+    in the README. Attributes are strings, as riemann wants them.
+
+        >>> attributes = {'container': 'foo', 'container_id': '123'}
+        >>> events = [
+        ...     {'time': 1, 'service': 'container foo cpu total usage', 'ttl': 60, 'attributes': attributes, 'metric_sint64': 5},
+        ...     {'time': 1, 'service': 'container foo memory usage', 'ttl': 60, 'attributes': attributes, 'metric_sint64': 7},
+        ...     {'time': 1, 'service': 'container bar stdout', 'attributes': {}},
+        ... ]
+        >>> events = Flatten().handle(events, 1)
+        >>> len(events)
+        2
+        >>> events[0]['service']
+        'container bar stdout'
+        >>> events[1]['service']
+        'container foo stats'
+        >>> sorted(events[1]['attributes'].items())
+        [('container', 'foo'), ('container_id', '123'), ('cpu_total_usage', '5'), ('memory_usage', '7')]
+        >>> 'metric_sint64' in events[1]
+        False
+
+    """
+
+    def handle(self, events, now):
+        passed = []
+        documents = {}
+
+        for event in events:
+            for k in window.METRICS:
+                if k in event:
+                    break
+            else:
+                passed.append(event)
+                continue
+
+            attributes = event['attributes']
+
+            prefix = 'container %s ' % attributes.get('container')
+            if not event['service'].startswith(prefix):
+                passed.append(event)
+                continue
+
+            document = documents.get(attributes['container_id'])
+            if document is None:
+                document = documents[attributes['container_id']] = {
+                    'time': event['time'],
+                    'state': event.get('state', 'ok'),
+                    'service': prefix + 'stats',
+                    'tags': event.get('tags', []),
+                    'ttl': event.get('ttl', 60),
+                    'attributes': dict(attributes),
+                    'base': attributes,
+                }
+
+            # e.g. percpu_usage
+            if attributes is not document['base']:
+                document['attributes'].update(attributes)
+
+            document['time'] = max(document['time'], event['time'])
+            document['attributes'][event['service'][len(prefix):].replace(' ', '_')] = str(event[k])
+
+        for document in documents.values():
+            del document['base']
+
+        return passed + list(documents.values())
+
+    def flush(self, now):
+        return []
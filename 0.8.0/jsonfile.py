@@ -0,0 +1,222 @@
+import ctypes
+import json
+import os
+import struct
+
+__all__ = ['Inotify', 'Tail', 'parse', 'load', 'save']
+
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+EVENT = struct.Struct('iIII')
+
+
+class Inotify(object):
+    """Minimal inotify binding
+
+        >>> import tempfile
+        >>> d = tempfile.mkdtemp()
+        >>> inotify = Inotify()
+        >>> wd = inotify.add_watch(d, IN_MODIFY | IN_CREATE)
+        >>> inotify.read()
+        []
+        >>> with open(os.path.join(d, 'x'), 'w') as f:
+        ...     _ = f.write('hi')
+        >>> [(w == wd, name) for w, mask, cookie, name in inotify.read()][0]
+        (True, 'x')
+        >>> inotify.rm_watch(wd)
+        >>> inotify.close()
+
+    """
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+
+        events = []
+
+        i = 0
+        while i + EVENT.size <= len(data):
+            wd, mask, cookie, n = EVENT.unpack_from(data, i)
+            i += EVENT.size
+            name = data[i:i + n].rstrip(b'\0').decode('utf-8', 'replace')
+            i += n
+            events.append((wd, mask, cookie, name))
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Tail(object):
+    """Follow a json-file log across rotations
+
+    Reads are large pread()s from the byte offset of the last complete line,
+    so (inode, offset) is a checkpoint that can be resumed from.
+
+        >>> import tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'c-json.log')
+        >>> with open(path, 'wb') as f:
+        ...     _ = f.write(b'one\\ntwo\\nthr')
+        >>> tail = Tail(path)
+        >>> tail.read()
+        [b'one', b'two']
+        >>> tail.offset
+        8
+        >>> with open(path, 'ab') as f:
+        ...     _ = f.write(b'ee\\n')
+        >>> tail.read()
+        [b'three']
+
+    Rotation, the rest of the old file is read before switching over:
+
+        >>> with open(path, 'ab') as f:
+        ...     _ = f.write(b'four\\n')
+        >>> os.rename(path, path + '.1')
+        >>> with open(path, 'wb') as f:
+        ...     _ = f.write(b'five\\n')
+        >>> tail.read()
+        [b'four', b'five']
+
+    Resuming from a checkpoint:
+
+        >>> tail.close()
+        >>> tail = Tail(path, tail.checkpoint())
+        >>> tail.read()
+        []
+        >>> tail.close()
+
+    """
+
+    size = 1024 * 1024
+
+    def __init__(self, path, checkpoint=None):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.inode = os.fstat(self.fd).st_ino
+        self.offset = 0
+
+        if checkpoint is not None:
+            inode, offset = checkpoint
+            if inode == self.inode and offset <= os.fstat(self.fd).st_size:
+                self.offset = offset
+
+    def checkpoint(self):
+        return [self.inode, self.offset]
+
+    def drain(self):
+        lines = []
+
+        while 1:
+            data = os.pread(self.fd, self.size, self.offset)
+            if not data:
+                break
+
+            i = data.rfind(b'\n')
+            if i < 0:
+                if len(data) < self.size:
+                    break
+                # a single line longer than a read, go round with a bigger one
+                self.size *= 2
+                continue
+
+            lines.extend(data[:i].split(b'\n'))
+            self.offset += i + 1
+
+            if len(data) < self.size:
+                break
+
+        return lines
+
+    def read(self):
+        # truncated in place
+        if os.fstat(self.fd).st_size < self.offset:
+            self.offset = 0
+
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = self.inode
+
+        # once rotated nothing more is written to the old file
+        lines = self.drain()
+
+        if inode != self.inode:
+            os.close(self.fd)
+            self.fd = os.open(self.path, os.O_RDONLY)
+            self.inode = os.fstat(self.fd).st_ino
+            self.offset = 0
+            lines.extend(self.drain())
+
+        return lines
+
+    def close(self):
+        os.close(self.fd)
+
+
+def parse(line):
+    """Parse a json-file log line
+
+    Returns the stream and the line in the same shape the logs API produces
+    with timestamps=1, so it can go straight to riemann.handle_log.
+
+        >>> parse(b'{"log":"HERE\\\\n","stream":"stderr","time":"2015-08-31T14:41:43.7027087Z"}')
+        ('stderr', b'2015-08-31T14:41:43.702708700Z HERE\\n')
+
+        >>> parse(b'{"log":"HERE\\\\n","stream":"stdout","time":"2015-08-31T14:41:43Z"}')
+        ('stdout', b'2015-08-31T14:41:43.000000000Z HERE\\n')
+
+        >>> parse(b'{"log":')
+        (None, None)
+
+    """
+    try:
+        data = json.loads(line.decode('utf-8'))
+        time_ = data['time']
+    except (ValueError, KeyError):
+        return None, None
+
+    a, _, b = time_.rstrip('Z').partition('.')
+    time_ = '%s.%sZ' % (a[:19], b[:9].ljust(9, '0'))
+
+    return data.get('stream', 'stdout'), ('%s %s' % (time_, data.get('log', ''))).encode('utf-8')
+
+
+def load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save(path, checkpoints):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoints, f)
+    os.rename(path + '.tmp', path)
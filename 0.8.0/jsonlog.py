@@ -0,0 +1,117 @@
+import json
+
+__all__ = ['JSONLog']
+
+# attribute -> keys it may be logged under, first found wins
+FIELDS = {
+    'level': ['level', 'severity', 'lvl', 'loglevel'],
+    'msg': ['msg', 'message'],
+    'trace_id': ['trace_id', 'traceId', 'trace.id'],
+}
+
+# level -> event state, numbers are bunyan / pino levels
+LEVELS = {
+    'trace': 'ok',
+    'debug': 'ok',
+    'info': 'ok',
+    'notice': 'ok',
+    'warn': 'warning',
+    'warning': 'warning',
+    'error': 'critical',
+    'err': 'critical',
+    'crit': 'critical',
+    'critical': 'critical',
+    'alert': 'critical',
+    'emerg': 'critical',
+    'fatal': 'critical',
+    'panic': 'critical',
+}
+
+
+class JSONLog(object):
+    """Lift fields out of log lines that are JSON objects
+
+    Only a log attribute starting with { is decoded. The configured fields
+    found become attributes and level sets the event state. Which key each
+    field is under is worked out once per container and set of keys.
+
+        >>> jsonlog = JSONLog()
+        >>> event = {'state': 'ok', 'attributes': {'container_id': '123', 'log': '{"level": "ERROR", "message": "oops", "traceId": 7}\\n'}}
+        >>> event = jsonlog.handle([event], 0)[0]
+        >>> event['state'], event['attributes']['level'], event['attributes']['msg'], event['attributes']['trace_id']
+        ('critical', 'ERROR', 'oops', '7')
+        >>> jsonlog.handle([{'state': 'ok', 'attributes': {'container_id': '123', 'log': '{"level": 40}'}}], 0)[0]['state']
+        'warning'
+        >>> sorted(jsonlog.handle([{'state': 'ok', 'attributes': {'container_id': '123', 'log': 'plain'}}], 0)[0]['attributes'])
+        ['container_id', 'log']
+        >>> len(jsonlog.schemas['123'])
+        2
+
+    """
+
+    def __init__(self, fields=None, levels=None, max_schemas=64):
+        self.fields = sorted((fields or FIELDS).items())
+        self.levels = dict(LEVELS, **(levels or {}))
+        self.max_schemas = max_schemas
+
+        # container id -> keys of a line -> [(attribute, key)]
+        self.schemas = {}
+
+    def schema(self, id_, data):
+        schemas = self.schemas.get(id_)
+        if schemas is None:
+            schemas = self.schemas[id_] = {}
+
+        keys = frozenset(data)
+
+        schema = schemas.get(keys)
+        if schema is None:
+            # free form keys, e.g. a field per request
+            if len(schemas) >= self.max_schemas:
+                schemas.clear()
+
+            schema = schemas[keys] = []
+            for attribute, names in self.fields:
+                for name in names:
+                    if name in keys:
+                        schema.append((attribute, name))
+                        break
+
+        return schema
+
+    def state(self, level):
+        if isinstance(level, int):
+            return 'critical' if level >= 50 else 'warning' if level >= 40 else 'ok'
+        return self.levels.get(str(level).lower())
+
+    def handle(self, events, now):
+        for event in events:
+            attributes = event['attributes']
+
+            log = attributes.get('log')
+            if not log or log[0] != '{':
+                continue
+
+            try:
+                data = json.loads(log)
+            except ValueError:
+                continue
+            if not isinstance(data, dict):
+                continue
+
+            for attribute, name in self.schema(attributes['container_id'], data):
+                value = data[name]
+                attributes[attribute] = value if isinstance(value, str) else json.dumps(value)
+
+                if attribute == 'level':
+                    state = self.state(value)
+                    if state is not None:
+                        event['state'] = state
+
+        return events
+
+    def flush(self, now):
+        return []
+
+    def forget(self, id_):
+        self.schemas.pop(id_, None)
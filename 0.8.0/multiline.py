@@ -0,0 +1,101 @@
+import re
+
+import riemann
+
+__all__ = ['Multiline']
+
+# indented, Traceback (most recent call last):, Java's at ..., Caused by: and ... 12 more
+CONTINUATION = rb'[ \t]|Traceback \(|at |Caused by: |\.\.\. \d+ more'
+
+# the last line of a python traceback, e.g. ValueError: boom
+EXCEPTION = re.compile(rb'[\w.]+(Error|Exception|Exit|Interrupt)(: |\r?\n|$)')
+
+
+class Multiline(object):
+    """Fold continuation lines into the record they belong to
+
+    Lines are (container, stream, line, attributes) records, see handle_log, a
+    line that continues the one before, e.g. the frames of a stack trace, is
+    appended to it, the record is passed on when its next record starts,
+    when it would grow past max_bytes or timeout seconds after its last
+    line. pattern is a regular expression of further continuation lines.
+
+        >>> multiline = Multiline(timeout=1)
+        >>> lines = [
+        ...     b'2015-08-31T14:41:43.702708748Z ERROR oops\\n',
+        ...     b'2015-08-31T14:41:43.702708749Z Traceback (most recent call last):\\n',
+        ...     b'2015-08-31T14:41:43.702708750Z   File "foo.py", line 1, in <module>\\n',
+        ...     b'2015-08-31T14:41:43.702708751Z ValueError: boom\\n',
+        ...     b'2015-08-31T14:41:44.702708748Z INFO done\\n',
+        ... ]
+        >>> records = multiline.handle([('foo', 'stderr', line, None) for line in lines], 0)
+        >>> for container, stream, line, attributes in records:
+        ...     print(line.decode('utf-8'))
+        2015-08-31T14:41:43.702708748Z ERROR oops
+        Traceback (most recent call last):
+          File "foo.py", line 1, in <module>
+        ValueError: boom
+        <BLANKLINE>
+        >>> multiline.flush(0.5)
+        []
+        >>> multiline.flush(1)
+        [('foo', 'stderr', b'2015-08-31T14:41:44.702708748Z INFO done\\n', None)]
+
+        >>> multiline = Multiline(pattern=r'\\}', max_bytes=40)
+        >>> lines = [b'2015-08-31T14:41:43.702708748Z {\\n', b'2015-08-31T14:41:43.702708748Z }\\n', b'2015-08-31T14:41:43.702708748Z   12345678\\n']
+        >>> [x[2][31:] for x in multiline.handle([('foo', 'stdout', line, None) for line in lines], 0) + multiline.flush(60)]
+        [b'{\\n}\\n', b'  12345678\\n']
+
+    """
+
+    def __init__(self, pattern=None, max_bytes=65536, timeout=1.0):
+        if pattern is not None:
+            self.continuation = re.compile(CONTINUATION + b'|' + pattern.encode('utf-8'))
+        else:
+            self.continuation = re.compile(CONTINUATION)
+
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+        # (container, stream) -> [parts, size, last line time, traceback]
+        self.buffers = {}
+
+    def handle(self, records, now):
+        passed = []
+
+        for container, stream, line, attributes in records:
+            m = riemann.TIMESTAMP.search(line)
+            if m is None or attributes is not None:
+                passed.append((container, stream, line, attributes))
+                continue
+
+            line = line[m.start():]
+            payload = line[31:]
+
+            key = (container, stream)
+            b = self.buffers.get(key)
+
+            if b is not None and b[1] + len(payload) <= self.max_bytes and (
+                    self.continuation.match(payload) or (b[3] and EXCEPTION.match(payload))):
+                b[0].append(payload)
+                b[1] += len(payload)
+                b[2] = now
+                b[3] = b[3] or payload.startswith(b'Traceback (')
+                continue
+
+            if b is not None:
+                passed.append((container, stream, b''.join(b[0]), None))
+
+            self.buffers[key] = [[line], len(line), now, payload.startswith(b'Traceback (')]
+
+        return passed
+
+    def flush(self, now):
+        passed = []
+
+        for key, b in list(self.buffers.items()):
+            if now - b[2] >= self.timeout:
+                del self.buffers[key]
+                passed.append(key + (b''.join(b[0]), None))
+
+        return passed
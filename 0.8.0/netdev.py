@@ -0,0 +1,108 @@
+import os
+
+__all__ = ['Sampler', 'parse']
+
+KEYS = [
+    (0, 'rx_bytes'),
+    (1, 'rx_packets'),
+    (2, 'rx_errors'),
+    (3, 'rx_dropped'),
+    (8, 'tx_bytes'),
+    (9, 'tx_packets'),
+    (10, 'tx_errors'),
+    (11, 'tx_dropped'),
+]
+
+
+def parse(data):
+    """Parse /proc/<pid>/net/dev, summed over every interface but lo
+
+        >>> data = b'''Inter-|   Receive                                                |  Transmit
+        ...  face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+        ...     lo:       10       1    0    0    0     0          0         0       10       1    0    0    0     0       0          0
+        ...   eth0:     578       7    0    0    0     0          0         0      668       8    0    0    0     0       0          0
+        ...   eth1:       2       1    0    1    0     0          0         0        0       0    0    0    0     0       0          0
+        ... '''
+        >>> sorted(parse(data).items())  # doctest: +NORMALIZE_WHITESPACE
+        [('rx_bytes', 580), ('rx_dropped', 1), ('rx_errors', 0), ('rx_packets', 8),
+         ('tx_bytes', 668), ('tx_dropped', 0), ('tx_errors', 0), ('tx_packets', 8)]
+
+    """
+    network = dict((k, 0) for _, k in KEYS)
+
+    for line in data.splitlines()[2:]:
+        iface, _, counters = line.partition(b':')
+        if iface.strip() == b'lo':
+            continue
+        counters = counters.split()
+        for i, k in KEYS:
+            network[k] += int(counters[i])
+
+    return network
+
+
+class Sampler(object):
+    """Network counters for every container in one sweep
+
+    Each container's init pid is in its own network namespace, so
+    /proc/<pid>/net/dev is opened once and re-read with pread().
+
+        >>> import tempfile
+        >>> proc = tempfile.mkdtemp()
+        >>> fake(proc, 42, 578, 668)
+        >>> sampler = Sampler(proc, interval=10)
+        >>> sampler.add('container', 42)
+        >>> [(c, x['rx_bytes'], x['tx_bytes']) for c, x in sampler.sample(100)]
+        [('container', 578, 668)]
+        >>> sampler.sample(105)
+        []
+        >>> sampler.remove('container')
+        >>> sampler.sweep()
+        []
+
+    """
+
+    def __init__(self, proc='/proc', interval=1.0):
+        self.proc = proc
+        self.interval = interval
+        self.fds = {}
+        self.last = 0
+
+    def add(self, container, pid):
+        self.fds[container] = os.open(os.path.join(self.proc, str(pid), 'net', 'dev'), os.O_RDONLY)
+
+    def remove(self, container):
+        fd = self.fds.pop(container, None)
+        if fd is not None:
+            os.close(fd)
+
+    def sweep(self):
+        samples = []
+
+        for container, fd in list(self.fds.items()):
+            try:
+                samples.append((container, parse(os.pread(fd, 65536, 0))))
+            except (OSError, ValueError, IndexError) as exc:
+                # the pid has gone
+                print(container, 'netdev', exc)
+                self.remove(container)
+
+        return samples
+
+    def sample(self, now):
+        if now - self.last < self.interval:
+            return []
+        self.last = now
+
+        return self.sweep()
+
+
+def fake(proc, pid, rx_bytes, tx_bytes):
+    """Write a fake /proc/<pid>/net/dev, for tests"""
+    path = os.path.join(proc, str(pid), 'net')
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'dev'), 'w') as f:
+        f.write('Inter-|   Receive                                                |  Transmit\n')
+        f.write(' face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed\n')
+        f.write('    lo:       0       0    0    0    0     0          0         0        0       0    0    0    0     0       0          0\n')
+        f.write('  eth0: %8d       0    0    0    0     0          0         0 %8d       0    0    0    0     0       0          0\n' % (rx_bytes, tx_bytes))
@@ -0,0 +1,146 @@
+import json
+
+__all__ = ['Projection']
+
+decoder = json.JSONDecoder()
+
+# arrays of plain integers that are cut out when nothing selects them
+ARRAYS = {
+    'percpu_usage': [
+        ('cpu_stats', 'cpu_usage', 'percpu_usage'),
+        ('precpu_stats', 'cpu_usage', 'percpu_usage'),
+    ],
+}
+
+
+class Projection(object):
+    """Decode only the selected paths of a JSON document
+
+    Only the top level values on a path are decoded, straight out of the
+    document with raw_decode(), everything else (precpu_stats, pids_stats,
+    ...) is skipped over. Integer arrays such as percpu_usage are cut out
+    beforehand with str.find() unless selected. Anything unexpected falls back to decoding
+    the whole document, the result is the same either way.
+
+        >>> p = Projection(['read', 'cpu_stats.cpu_usage.total_usage', 'memory_stats.limit'])
+        >>> data = b'{"read":"now","precpu_stats":{"cpu_usage":{"total_usage":1}},"cpu_stats":{"cpu_usage":{"percpu_usage":[1,2],"total_usage":3}},"memory_stats":{"limit":4,"usage":2}}'
+        >>> p.loads(data) == {'read': 'now', 'cpu_stats': {'cpu_usage': {'total_usage': 3}}, 'memory_stats': {'limit': 4}}
+        True
+        >>> p.fallbacks
+        0
+
+    Keys that are missing are left out, as they would be with a full parse:
+
+        >>> p.loads(b'{"read":"now"}')
+        {'read': 'now'}
+
+    Whitespace and the like defeat the fast path but not the result:
+
+        >>> p.loads(b'{"read" : "now", "memory_stats": {"limit": 4}}') == {'read': 'now', 'memory_stats': {'limit': 4}}
+        True
+        >>> p.fallbacks
+        1
+
+    """
+
+    def __init__(self, paths):
+        self.tree = {}
+        for path in paths:
+            node = self.tree
+            keys = path.split('.')
+            for k in keys[:-1]:
+                node = node.setdefault(k, {})
+                if node is True:
+                    break
+            else:
+                node[keys[-1]] = True
+
+        self.arrays = ['"%s":[' % k for k, paths in ARRAYS.items() if not any(self.covers(x) for x in paths)]
+
+        self.markers = [(k, '"%s":' % k, v) for k, v in self.tree.items()]
+
+        self.fallbacks = 0
+
+    def covers(self, path):
+        """Whether anything at path is selected"""
+        node = self.tree
+        for k in path:
+            if k not in node:
+                return False
+            node = node[k]
+            if node is True:
+                return True
+        return True
+
+    def loads(self, data):
+        s = data.decode('utf-8')
+
+        try:
+            return self.fast(s)
+        except (ValueError, IndexError, TypeError, KeyError):
+            self.fallbacks += 1
+            return prune(json.loads(s), self.tree)
+
+    def fast(self, s):
+        for marker in self.arrays:
+            s = strip(s, marker)
+
+        result = {}
+
+        for key, marker, tree in self.markers:
+            i = s.find(marker)
+            if i < 0:
+                if marker[:-1] in s:
+                    raise ValueError(key)
+                continue
+
+            # the marker has to be a key, not inside a string
+            if s[i - 1] not in '{,':
+                raise ValueError(key)
+
+            value, _ = decoder.raw_decode(s, i + len(marker))
+
+            result[key] = value if tree is True else prune(value, tree)
+
+        return result
+
+
+def strip(s, marker):
+    """Cut out every marker...] array
+
+        >>> strip('{"a":[1,2],"b":[3],"c":{"a":[]}}', '"a":[')
+        '{"b":[3],"c":{}}'
+        >>> strip('{"b":1,"a":[1,2]}', '"a":[')
+        '{"b":1}'
+
+    """
+    parts = []
+
+    i = 0
+    while 1:
+        j = s.find(marker, i)
+        if j < 0:
+            break
+        k = s.index(']', j) + 1
+
+        # take a comma with it, the following one if there is no preceding one
+        if s[j - 1] == ',':
+            j -= 1
+        elif s[k] == ',':
+            k += 1
+
+        parts.append(s[i:j])
+        i = k
+
+    if not parts:
+        return s
+
+    parts.append(s[i:])
+    return ''.join(parts)
+
+
+def prune(value, tree):
+    if tree is True:
+        return value
+
+    return dict((k, prune(value[k], v)) for k, v in tree.items() if k in value)
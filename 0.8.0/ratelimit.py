@@ -0,0 +1,127 @@
+import time
+
+import riemann
+
+__all__ = ['RateLimit']
+
+
+class RateLimit(object):
+    """Token bucket per container for log lines
+
+    Each container may log rate lines a second with bursts of up to burst
+    lines, the labels events.logs.rate and events.logs.burst override them
+    per container and a rate of 0 is no limit. A label that isn't a number
+    of 0 or more is logged and the setting used instead. Lines over the
+    limit are counted and dropped as they are read, before the log stages
+    see them, every report seconds the count is sent as "container <name>
+    logs dropped".
+
+        >>> ratelimit = RateLimit(rate=2, burst=3)
+        >>> ratelimit.add('123', {})
+        >>> [ratelimit.allow('123', 0) for _ in range(5)]
+        [True, True, True, False, False]
+        >>> ratelimit.allow('123', 0.5), ratelimit.allow('123', 0.5)
+        (True, False)
+        >>> ratelimit.add('456', {'events.logs.rate': '0'})
+        >>> all(ratelimit.allow('456', 0) for _ in range(100))
+        True
+        >>> ratelimit.add('789', {'events.logs.rate': 'fast', 'events.logs.burst': '-1'})
+        ratelimit 789 events.logs.rate 'fast'
+        ratelimit 789 events.logs.burst '-1'
+        >>> ratelimit.buckets['789'][:2]
+        [2.0, 3.0]
+        >>> info = {'Id': '123', 'Image': '', 'Name': '/foo', 'Config': {'Image': '', 'Cmd': [], 'Entrypoint': ''}}
+        >>> ratelimit.flush(0, {'123': info})
+        []
+        >>> [(x['service'], x['metric_sint64']) for x in ratelimit.flush(60, {'123': info})]
+        [('container foo logs dropped', 3)]
+        >>> [(x['service'], x['metric_sint64']) for x in ratelimit.flush(120, {'123': info})]
+        [('container foo logs dropped', 0)]
+
+    """
+
+    def __init__(self, rate=100, burst=1000, report=60):
+        self.rate = rate
+        self.burst = burst
+        self.report = report
+        self.reported = None
+
+        # container id -> [rate, burst, tokens, last refill, dropped]
+        self.buckets = {}
+
+    def add(self, id_, labels):
+        rate = self.label(id_, labels, 'events.logs.rate', self.rate)
+        burst = self.label(id_, labels, 'events.logs.burst', max(self.burst, rate))
+
+        self.buckets[id_] = [rate, burst, burst, None, 0]
+
+    def label(self, id_, labels, name, default):
+        default = max(float(default), 0.0)
+
+        value = labels.get(name)
+        if value is None:
+            return default
+
+        try:
+            value = float(value)
+        except ValueError:
+            value = None
+
+        # not nan or inf either
+        if value is None or not 0 <= value < float('inf'):
+            print('ratelimit', id_, name, repr(labels[name]))
+            return default
+
+        return value
+
+    def forget(self, id_):
+        self.buckets.pop(id_, None)
+
+    def allow(self, id_, now):
+        b = self.buckets.get(id_)
+        if b is None or not b[0]:
+            return True
+
+        if b[3] is not None:
+            b[2] = min(b[1], b[2] + (now - b[3]) * b[0])
+        b[3] = now
+
+        if b[2] >= 1:
+            b[2] -= 1
+            return True
+
+        b[4] += 1
+        return False
+
+    def flush(self, now, infos):
+        """Dropped line counts of the containers in infos (id -> inspect), every report seconds"""
+        if self.reported is None:
+            self.reported = now
+
+        if now - self.reported < self.report:
+            return []
+
+        self.reported = now
+
+        events = []
+
+        for id_, b in sorted(self.buckets.items()):
+            # only limited containers
+            if not b[0] or id_ not in infos:
+                continue
+
+            info = infos[id_]
+
+            events.append({
+                'time': int(now),
+                'state': 'ok' if not b[4] else 'warning',
+                'service': 'container %s logs dropped' % info['Name'].lstrip('/'),
+                'tags': [],
+                'ttl': 2 * self.report,
+                'attributes': riemann.container_attributes(info, time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))),
+                'metric_sint64': b[4],
+            })
+
+            b[4] = 0
+
+        return events
@@ -0,0 +1,152 @@
+import calendar
+import time
+
+import riemann
+
+__all__ = ['Rates']
+
+# what Rates reads from a stats document, see project.py
+PATHS = [
+    'read',
+    'blkio_stats',
+    'cpu_stats.cpu_usage.total_usage',
+    'cpu_stats.cpu_usage.percpu_usage',
+    'cpu_stats.online_cpus',
+    'cpu_stats.system_cpu_usage',
+    'precpu_stats.cpu_usage.total_usage',
+    'precpu_stats.system_cpu_usage',
+    'network',
+]
+
+
+def timestamp(read):
+    """Seconds since the epoch of a stats read time
+
+        >>> '%.3f' % timestamp('2015-09-23T04:13:56.297129480Z')
+        '1442981636.297'
+        >>> timestamp('2015-09-23T04:13:56Z')
+        1442981636.0
+
+    """
+    a, _, b = read.rstrip('Z').partition('.')
+    return calendar.timegm(time.strptime(a, '%Y-%m-%dT%H:%M:%S')) + float('0.' + (b or '0'))
+
+
+def counters(data):
+    """The monotonic counters in a stats document"""
+    c = {}
+
+    for k, v in data.get('network', {}).items():
+        c['network %s rate' % k] = v
+
+    blkio = data.get('blkio_stats', {})
+    for k, name in [('io_service_bytes_recursive', 'bytes rate'), ('io_serviced_recursive', 'iops')]:
+        for x in blkio.get(k) or []:
+            op = x['op'].lower()
+            if op in ('read', 'write'):
+                k2 = 'blkio %s %s' % (op, name)
+                c[k2] = c.get(k2, 0) + x['value']
+
+    return c
+
+
+class Rates(object):
+    """Turn stats counters into rates
+
+    Per container state holds the previous sample. CPU percent comes from
+    precpu_stats when docker provides it (100 is one core), otherwise from
+    the previous sample against wall clock time. A counter that goes
+    backwards has been reset and is skipped until the next sample.
+
+        >>> info = {'Name': '/foo', 'Id': '123', 'Config': {'Image': 'centos:7', 'Cmd': ['true'], 'Entrypoint': ''}, 'Image': 'abc'}
+        >>> def sample(read, cpu, system, rx):
+        ...     return {'read': read, 'network': {'rx_bytes': rx},
+        ...             'cpu_stats': {'cpu_usage': {'total_usage': cpu, 'percpu_usage': [0, 0]}, 'system_cpu_usage': system},
+        ...             'precpu_stats': {'cpu_usage': {'total_usage': 0}, 'system_cpu_usage': 0},
+        ...             'blkio_stats': {'io_serviced_recursive': [{'op': 'Read', 'value': rx}, {'op': 'Total', 'value': rx}]}}
+        >>> rates = Rates()
+
+        >>> [(x['service'], x['metric_d']) for x in rates.handle(sample('2015-09-23T04:13:56Z', 10 ** 9, 4 * 10 ** 9, 100), info)]
+        [('container foo cpu percent', 50.0)]
+
+        >>> [(x['service'], x['metric_d']) for x in rates.handle(sample('2015-09-23T04:13:58Z', 10 ** 9, 4 * 10 ** 9, 300), info)]  # doctest: +NORMALIZE_WHITESPACE
+        [('container foo cpu percent', 50.0), ('container foo network rx_bytes rate', 100.0),
+         ('container foo blkio read iops', 100.0)]
+
+    Reset:
+
+        >>> [x['service'] for x in rates.handle(sample('2015-09-23T04:13:59Z', 10 ** 9, 4 * 10 ** 9, 0), info)]
+        ['container foo cpu percent']
+
+    Without precpu_stats, e.g. from the cgroup backend:
+
+        >>> data = {'read': '2015-09-23T04:13:56Z', 'cpu_stats': {'cpu_usage': {'total_usage': 0}}}
+        >>> rates.handle(data, info)
+        []
+        >>> data = {'read': '2015-09-23T04:13:58Z', 'cpu_stats': {'cpu_usage': {'total_usage': 10 ** 9}}}
+        >>> [(x['service'], x['metric_d']) for x in rates.handle(data, info)]
+        [('container foo cpu percent', 50.0)]
+
+    """
+
+    def __init__(self):
+        self.previous = {}
+
+    def forget(self, id_):
+        self.previous.pop(id_, None)
+
+    def handle(self, data, info):
+        events = []
+
+        read = data['read']
+        now = timestamp(read)
+
+        name = info['Name'].lstrip('/')
+
+        attributes = riemann.container_attributes(info, read.split('.')[0].rstrip('Z') + 'Z')
+
+        def event(service, metric):
+            events.append({
+                'time': int(now),
+                'state': 'ok',
+                'service': 'container %s %s' % (name, service),
+                'tags': [],
+                'ttl': 60,
+                'attributes': attributes,
+                'metric_d': metric,
+            })
+
+        cpu = data['cpu_stats']['cpu_usage']['total_usage']
+
+        c = counters(data)
+
+        previous = self.previous.get(info['Id'])
+        self.previous[info['Id']] = (now, cpu, c)
+
+        # cpu_stats/precpu_stats
+        precpu = data.get('precpu_stats')
+        if precpu and 'system_cpu_usage' in precpu and 'system_cpu_usage' in data['cpu_stats']:
+            cpu_delta = cpu - precpu['cpu_usage']['total_usage']
+            system_delta = data['cpu_stats']['system_cpu_usage'] - precpu['system_cpu_usage']
+            ncpu = data['cpu_stats'].get('online_cpus') or len(data['cpu_stats']['cpu_usage'].get('percpu_usage') or []) or 1
+            if cpu_delta >= 0 and system_delta > 0:
+                event('cpu percent', float(cpu_delta) / system_delta * ncpu * 100.0)
+        elif previous is not None:
+            dt = now - previous[0]
+            if dt > 0 and cpu >= previous[1]:
+                event('cpu percent', (cpu - previous[1]) / 1e9 / dt * 100.0)
+
+        if previous is None:
+            return events
+
+        dt = now - previous[0]
+        if dt <= 0:
+            return events
+
+        for k, v in c.items():
+            v0 = previous[2].get(k)
+            if v0 is None or v < v0:
+                continue
+            event(k, (v - v0) / dt)
+
+        return events
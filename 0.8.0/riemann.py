@@ -0,0 +1,329 @@
+import copy
+import datetime
+import functools
+import re
+import shlex
+
+import riemann_client.client
+
+__all__ = ['handle_log', 'handle_stat', 'compile', 'METRICS']
+
+# what handle_stat emits by default, see compile
+METRICS = [
+    'blkio *',
+    'cpu total usage',
+    'memory limit',
+    'memory usage',
+    'memory usage percent',
+    # https://www.kernel.org/doc/Documentation/cgroups/memory.txt
+    'memory cache',
+    'memory rss',
+    'memory swap',
+    'network *',
+]
+
+# the timestamp docker puts before each log line, after the stream header
+TIMESTAMP = re.compile(rb'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{9}Z ')
+
+
+def handle_log(line, info, stream=None):
+    """Handle a line of log output
+
+        >>> line = b"\\x01" + (b"\\x00" * 7) + b"2015-08-31T14:41:43.702708748Z HERE"
+        >>> info = {'Id': '', 'Image': '', 'Name': 'foo', 'Config': {'Image': '', 'Cmd': [], 'Entrypoint': ''}}
+
+        >>> events = handle_log(line, info)
+
+        >>> len(events)
+        1
+        >>> event = events[0]
+        >>> riemann_client.client.Client.create_event(copy.deepcopy(event))  # doctest: +ELLIPSIS
+        <google.protobuf...>
+
+        >>> event['time']
+        1441032103
+        >>> event['state']
+        'ok'
+        >>> event['service']
+        'container foo stdout'
+        >>> event['tags']
+        []
+        >>> event['ttl']
+        60
+
+        >>> event['attributes']['container']
+        'foo'
+        >>> event['attributes']['container_id']
+        ''
+        >>> event['attributes']['image']
+        ''
+        >>> event['attributes']['image_id']
+        ''
+        >>> event['attributes']['log']
+        'HERE'
+        >>> event['attributes']['stream']
+        'stdout'
+        >>> event['attributes']['@timestamp']
+        '2015-08-31T14:41:43Z'
+
+        >>> line = b"Error running logs job:"
+        >>> info = {'Id': '', 'Image': '', 'Name': 'foo', 'Config': {'Image': '', 'Cmd': [], 'Entrypoint': ''}}
+
+        >>> events = handle_log(line, info)
+
+    """
+    # https://github.com/docker/docker/blob/87e7ee914261efd2580accae98569466f42cd003/api/server/router/container/container_routes.go#L148
+    if line.startswith(b"Error running logs job:"):
+        return []
+
+    a = stream if stream is not None else 'stdout'
+
+    m = TIMESTAMP.search(line)
+
+    line = line[m.start():]
+
+    b = line[:30]
+    c = line[31:]
+
+    event = {
+        'time': int((datetime.datetime.strptime(b.decode('utf-8').split('.')[0], '%Y-%m-%dT%H:%M:%S') - datetime.datetime(1970,1,1)).total_seconds()),
+        'state': 'ok',
+        'service': 'container %s %s' % (info['Name'].lstrip('/'), a),
+        'tags': [],
+        'ttl': 60,
+        'attributes': {
+            'container': info['Name'].lstrip('/'),
+            'container_id': info['Id'],
+            'image': info['Config']['Image'],
+            'image_id': info['Image'],
+            'container_cmd': ' '.join([shlex.quote(x) for x in (info['Config']['Cmd'] if info['Config']['Cmd'] is not None else [])]),
+
+            'log': c.decode('utf-8'),
+            'stream': a,
+            '@timestamp': b.decode('utf-8').split('.')[0]+'Z',
+        },
+    }
+
+    return [event]
+
+
+def container_attributes(info, timestamp):
+    """Attributes common to every container event"""
+    return {
+        'container': info['Name'].lstrip('/'),
+        'container_id': info['Id'],
+        'image': info['Config']['Image'],
+        'image_id': info['Image'],
+        'container_cmd': ' '.join([shlex.quote(x) for x in (info['Config']['Cmd'] if info['Config']['Cmd'] is not None else [])]),
+        '@timestamp': timestamp,
+    }
+
+
+def handle_stat(data, info, metrics=None):
+    """Handle stat
+
+        >>> blkio_stats = {}
+        >>> cpu_stats = {'cpu_usage': {'total_usage': 0, 'usage_in_kernelmode': 0, 'usage_in_usermode': 0, 'percpu_usage': []}}
+        >>> memory_stats = {'limit': 256 * 1024 * 1024, 'usage': 128 * 1024 * 1024}
+        >>> network = {}
+        >>> data = {'read': '2015-09-23T04:13:56.297129480Z', 'blkio_stats': blkio_stats, 'cpu_stats': cpu_stats, 'memory_stats': memory_stats, 'network': network}
+        >>> info = {'Name': 'foo', 'Id': '123', 'Config': {'Image': 'centos:7', 'Cmd': ['true'], 'Entrypoint': ''}, 'Image': 'abc'}
+        >>> events = handle_stat(data, info)
+
+        >>> len(events)
+        4
+        >>> event = events[0]
+        >>> riemann_client.client.Client.create_event(copy.deepcopy(event))  # doctest: +ELLIPSIS
+        <google.protobuf...>
+
+        >>> event['time']
+        1442981636
+        >>> event['state']
+        'ok'
+        >>> event['service']
+        'container foo cpu total usage'
+        >>> event['tags']
+        []
+        >>> event['ttl']
+        60
+        >>> event['attributes']['container']
+        'foo'
+        >>> event['attributes']['container_id']
+        '123'
+        >>> event['attributes']['image']
+        'centos:7'
+        >>> event['attributes']['image_id']
+        'abc'
+        >>> event['attributes']['@timestamp']
+        '2015-09-23T04:13:56Z'
+
+        >>> metrics = compile(['cpu usage in usermode', 'memory usage percent', 'network rx_bytes'])
+        >>> data['network'] = {'rx_bytes': 1, 'tx_bytes': 2}
+        >>> [(x['service'], x['metric_sint64']) for x in handle_stat(data, info, metrics)]
+        [('container foo cpu usage in usermode', 0), ('container foo memory usage percent', 50), ('container foo network rx_bytes', 1)]
+
+    """
+
+    if metrics is None:
+        metrics = DEFAULT
+
+    events = []
+
+    time_ = timestamp(data['read'].split('.')[0])
+
+    attributes = container_attributes(info, data['read'].split('.')[0]+'Z')
+
+    name = info['Name'].lstrip('/')
+
+    for service, extractor in metrics.extractors:
+        try:
+            values = extractor(data)
+        except (KeyError, TypeError):
+            # e.g. swap without swap accounting
+            continue
+
+        for x in values:
+            event = {
+                'time': time_,
+                'state': 'ok',
+                'service': 'container %s %s' % (name, x[0]),
+                'tags': [],
+                'ttl': 60,
+                'attributes': attributes if len(x) == 2 else dict(attributes, **x[2]),
+                'metric_sint64': x[1],
+            }
+            events.append(event)
+
+    return events
+
+
+@functools.lru_cache(maxsize=64)
+def timestamp(read):
+    return int((datetime.datetime.strptime(read, '%Y-%m-%dT%H:%M:%S') - datetime.datetime(1970,1,1)).total_seconds())
+
+
+class Metrics(object):
+
+    def __init__(self, extractors, paths):
+        self.extractors = extractors
+        self.paths = paths
+        self.services = [service for service, _ in extractors]
+
+
+def compile(spec):
+    """Compile a metric spec into a flat list of extractors
+
+    Each name is a service without the "container <name> " prefix, e.g.
+    "memory usage", "memory pgfault" (any memory_stats.stats key, total_
+    preferred), "cpu usage in kernelmode", "network rx_bytes", or "blkio *"
+    and "network *" for everything there. paths is what the extractors
+    read, see project.py.
+
+    Per-CPU usage is never one event per core, "cpu percpu usage" is one
+    event with the vector in a percpu_usage attribute, "cpu percpu max",
+    "min" and "stddev" summarise it. The vector is the usage since
+    precpu_stats, nothing is sent without a precpu_stats vector for the
+    same cores, e.g. the first sample of a stream or a one-shot poll.
+
+        >>> data = {'cpu_stats': {'cpu_usage': {'percpu_usage': [30, 12, 20, 40]}},
+        ...         'precpu_stats': {'cpu_usage': {'percpu_usage': [10, 10, 10, 10]}}}
+        >>> metrics = compile(['cpu percpu usage', 'cpu percpu max', 'cpu percpu min', 'cpu percpu stddev'])
+        >>> [f(data) for _, f in metrics.extractors]
+        [[('cpu percpu usage', 62, {'percpu_usage': '20,2,10,30'})], [('cpu percpu max', 30)], [('cpu percpu min', 2)], [('cpu percpu stddev', 11)]]
+        >>> del data['precpu_stats']
+        >>> metrics.extractors[0][1](data), metrics.extractors[1][1](data)
+        ([], [])
+        >>> data = {'cpu_stats': {'cpu_usage': {'percpu_usage': []}}, 'precpu_stats': {'cpu_usage': {'percpu_usage': []}}}
+        >>> [f(data) for _, f in metrics.extractors]
+        [[], [], [], []]
+
+        >>> metrics = compile(['memory rss', 'network *'])
+        >>> metrics.paths
+        ['read', 'memory_stats.stats', 'network']
+        >>> data = {'memory_stats': {'stats': {'rss': 1, 'total_rss': 2}}, 'network': {'rx_bytes': 3}}
+        >>> [f(data) for _, f in metrics.extractors]
+        [[('memory rss', 2)], [('network rx_bytes', 3)]]
+
+        >>> compile(['memory'])
+        Traceback (most recent call last):
+        ...
+        ValueError: memory
+
+    """
+    extractors = []
+    paths = ['read']
+
+    def add(service, extractor, path):
+        if extractor is not None:
+            extractors.append((service, extractor))
+        if path not in paths:
+            paths.append(path)
+
+    for service in spec:
+        a, _, b = service.partition(' ')
+
+        if service == 'blkio *':
+            add(service, lambda data: [('blkio %s %s' % (k, x['op'].lower()), x['value']) for k, v in data['blkio_stats'].items() for x in v], 'blkio_stats')
+        elif a == 'blkio' and b:
+            add(service, lambda data, b=b: [('blkio %s %s' % (b, x['op'].lower()), x['value']) for x in data['blkio_stats'][b]], 'blkio_stats.' + b)
+        elif service in ('cpu total usage', 'cpu usage in kernelmode', 'cpu usage in usermode'):
+            k = service[4:].replace(' ', '_')
+            add(service, lambda data, k=k, service=service: [(service, data['cpu_stats']['cpu_usage'][k])], 'cpu_stats.cpu_usage.' + k)
+        elif service == 'cpu percpu usage':
+            add(service, lambda data, service=service: vector(service, percpu(data)), 'cpu_stats.cpu_usage.percpu_usage')
+            add(None, None, 'precpu_stats.cpu_usage.percpu_usage')
+        elif service in ('cpu percpu max', 'cpu percpu min', 'cpu percpu stddev'):
+            f = {'max': max, 'min': min, 'stddev': stddev}[service[11:]]
+            add(service, lambda data, f=f, service=service: summary(service, f, percpu(data)), 'cpu_stats.cpu_usage.percpu_usage')
+            add(None, None, 'precpu_stats.cpu_usage.percpu_usage')
+        elif service in ('memory limit', 'memory usage'):
+            add(service, lambda data, b=b, service=service: [(service, data['memory_stats'][b])], 'memory_stats.' + b)
+        elif service == 'memory usage percent':
+            add(service, lambda data, service=service: [(service, int(round(float(data['memory_stats']['usage']) / float(data['memory_stats']['limit']) * 100.0)))], 'memory_stats.usage')
+            add(None, None, 'memory_stats.limit')
+        elif a == 'memory' and b:
+            add(service, lambda data, b=b, service=service: [(service, data['memory_stats']['stats'].get('total_' + b, data['memory_stats']['stats'][b]))], 'memory_stats.stats')
+        elif service == 'network *':
+            add(service, lambda data: [('network %s' % k, v) for k, v in data.get('network', {}).items()], 'network')
+        elif a == 'network' and b:
+            add(service, lambda data, b=b, service=service: [(service, data['network'][b])], 'network')
+        else:
+            raise ValueError(service)
+
+    return Metrics(extractors, paths)
+
+
+def percpu(data):
+    """Per-CPU usage since precpu_stats, None without it"""
+    usage = data['cpu_stats']['cpu_usage']['percpu_usage']
+
+    try:
+        preusage = data['precpu_stats']['cpu_usage']['percpu_usage']
+    except (KeyError, TypeError):
+        return None
+
+    # not the counters instead, they aren't the same thing
+    if not usage or not preusage or len(preusage) != len(usage):
+        return None
+
+    return [a - b for a, b in zip(usage, preusage)]
+
+
+def vector(service, values):
+    if not values:
+        return []
+    return [(service, sum(values), {'percpu_usage': ','.join([str(x) for x in values])})]
+
+
+def summary(service, f, values):
+    if not values:
+        return []
+    return [(service, int(round(f(values))))]
+
+
+def stddev(values):
+    mean = float(sum(values)) / len(values)
+    return (sum((x - mean) ** 2 for x in values) / len(values)) ** 0.5
+
+
+DEFAULT = compile(METRICS)
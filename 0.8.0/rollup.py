@@ -0,0 +1,120 @@
+import filters
+import window
+
+__all__ = ['Rollup']
+
+
+class Rollup(object):
+    """Per image, label and node rollups of container metrics
+
+    The latest value of each selected metric is kept per container, every
+    flush sends the sum and max over the containers of each image, of each
+    value of label, and of the whole node. Containers matching the drop
+    rules (see filters.py) only count towards the rollups, their own
+    events go no further.
+
+        >>> rollup = Rollup(['memory usage'], label='team', drop=['label:priority=low'])
+        >>> def info(id_, image, labels):
+        ...     return {'Id': id_, 'Name': '/' + id_, 'Config': {'Image': image, 'Labels': labels}}
+        >>> rollup.add(info('a', 'nginx', {'team': 'web'}))
+        >>> rollup.add(info('b', 'nginx', {'team': 'web', 'priority': 'low'}))
+        >>> rollup.add(info('c', 'redis', {}))
+        >>> def event(id_, service, metric):
+        ...     return {'time': 1, 'service': 'container %s %s' % (id_, service), 'ttl': 60,
+        ...             'attributes': {'container': id_, 'container_id': id_}, 'metric_sint64': metric}
+        >>> events = [event('a', 'memory usage', 1), event('b', 'memory usage', 2), event('c', 'memory usage', 4), event('b', 'memory limit', 8)]
+        >>> [x['service'] for x in rollup.handle(events, 1)]
+        ['container a memory usage', 'container c memory usage']
+        >>> for x in rollup.flush(1):
+        ...     print(x['service'], x['metric_sint64'])
+        rollup image nginx memory usage sum 3
+        rollup image nginx memory usage max 2
+        rollup image redis memory usage sum 4
+        rollup image redis memory usage max 4
+        rollup label team=web memory usage sum 3
+        rollup label team=web memory usage max 2
+        rollup node memory usage sum 7
+        rollup node memory usage max 4
+
+        >>> rollup.remove('c')
+        >>> [x['metric_sint64'] for x in rollup.flush(2) if x['service'] == 'rollup node memory usage sum']
+        [3]
+
+    """
+
+    def __init__(self, metrics=('cpu percent', 'memory usage'), label=None, drop=()):
+        self.metrics = set(metrics)
+        self.label = label
+        self.drop = filters.Filter(include=drop) if drop else None
+
+        # container id -> [groups, dropped, {metric: (key, value)}]
+        self.containers = {}
+
+    def add(self, info):
+        labels = info['Config'].get('Labels') or {}
+
+        groups = ['image %s' % info['Config']['Image']]
+        if self.label is not None and self.label in labels:
+            groups.append('label %s=%s' % (self.label, labels[self.label]))
+        groups.append('node')
+
+        dropped = self.drop is not None and self.drop.match(info['Name'].lstrip('/'), info['Config']['Image'], labels)
+
+        self.containers[info['Id']] = [groups, dropped, {}]
+
+    def remove(self, id_):
+        self.containers.pop(id_, None)
+
+    def handle(self, events, now):
+        passed = []
+
+        for event in events:
+            attributes = event.get('attributes', {})
+
+            c = self.containers.get(attributes.get('container_id'))
+            if c is None:
+                passed.append(event)
+                continue
+
+            for k in window.METRICS:
+                if k in event:
+                    metric = event['service'][len('container %s ' % attributes['container']):]
+                    if metric in self.metrics:
+                        c[2][metric] = (k, event[k])
+                    break
+
+            if not c[1]:
+                passed.append(event)
+
+        return passed
+
+    def flush(self, now):
+        # (group, metric) -> [key, sum, max]
+        rollups = {}
+
+        for groups, _, values in self.containers.values():
+            for metric, (k, v) in values.items():
+                for group in groups:
+                    r = rollups.get((group, metric))
+                    if r is None:
+                        rollups[(group, metric)] = [k, v, v]
+                    else:
+                        r[1] += v
+                        if v > r[2]:
+                            r[2] = v
+
+        events = []
+
+        for (group, metric), (k, sum_, max_) in sorted(rollups.items()):
+            for aggregate, v in [('sum', sum_), ('max', max_)]:
+                events.append({
+                    'time': int(now),
+                    'state': 'ok',
+                    'service': 'rollup %s %s %s' % (group, metric, aggregate),
+                    'tags': [],
+                    'ttl': 60,
+                    'attributes': {},
+                    k: v,
+                })
+
+        return events
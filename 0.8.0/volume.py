@@ -0,0 +1,129 @@
+import re
+import time
+
+import filters
+import riemann
+
+__all__ = ['Volume']
+
+LEVEL = re.compile(rb'\b(trace|debug|info|warn|warning|error|err|fatal|critical|crit|panic)\b', re.IGNORECASE)
+
+LEVELS = {
+    b'warning': 'warn',
+    b'err': 'error',
+    b'critical': 'fatal',
+    b'crit': 'fatal',
+    b'panic': 'fatal',
+}
+
+
+class Volume(object):
+    """Count log lines instead of sending them
+
+    The lines of containers labelled events.logs.volume=true, or matching
+    every match rule (see filters.py), are only counted, per stream, with
+    their bytes (without the timestamp) and the level found in their first
+    256 bytes. Every seconds seconds "container <name> <stream> lines",
+    "... bytes" and "... level <level>" are sent instead.
+
+        >>> import docker
+        >>> volume = Volume(seconds=60)
+        >>> container = docker.Container('123', 1, name='foo', labels={'events.logs.volume': 'true'})
+        >>> container._info = {'Id': '123', 'Image': '', 'Name': '/foo', 'Config': {'Image': '', 'Cmd': [], 'Entrypoint': ''}}
+        >>> volume.add(container)
+        >>> lines = [b'2015-08-31T14:41:43.702708748Z level=info ok\\n', b'2015-08-31T14:41:43.702708748Z [ERROR] oops\\n', b'2015-08-31T14:41:43.702708748Z hi\\n']
+        >>> [volume.handle(container, 'stdout', line) for line in lines]
+        [True, True, True]
+        >>> volume.flush(0)
+        []
+        >>> for x in volume.flush(60):
+        ...     print(x['service'], x['metric_sint64'])
+        container foo stdout lines 3
+        container foo stdout bytes 30
+        container foo stdout level error 1
+        container foo stdout level info 1
+        >>> [x['metric_sint64'] for x in volume.flush(120)]
+        [0, 0, 0, 0]
+
+        >>> volume.handle(docker.Container('456', 1, name='bar'), 'stdout', lines[0])
+        False
+
+    """
+
+    def __init__(self, seconds=60, match=()):
+        self.seconds = seconds
+        self.filter = filters.Filter(include=match) if match else None
+        self.start = None
+
+        # container id -> (container, {stream: [lines, bytes, {level: lines}]})
+        self.containers = {}
+
+    def add(self, container):
+        if container.labels.get('events.logs.volume') == 'true' or (
+                self.filter is not None and self.filter.match(container.name, container.image, container.labels)):
+            self.containers[container.id_] = (container, {})
+
+    def forget(self, id_):
+        self.containers.pop(id_, None)
+
+    def handle(self, container, stream, line):
+        """Count line, False if the container's lines aren't counted"""
+        c = self.containers.get(container.id_)
+        if c is None:
+            return False
+
+        counts = c[1].get(stream)
+        if counts is None:
+            counts = c[1][stream] = [0, 0, {}]
+
+        m = riemann.TIMESTAMP.search(line)
+        start = m.end() if m is not None else 0
+
+        counts[0] += 1
+        counts[1] += len(line) - start
+
+        m = LEVEL.search(line, start, start + 256)
+        if m is not None:
+            level = m.group(1).lower()
+            level = LEVELS.get(level, level.decode('utf-8'))
+            counts[2][level] = counts[2].get(level, 0) + 1
+
+        return True
+
+    def flush(self, now):
+        if self.start is None:
+            self.start = now
+
+        if now - self.start < self.seconds:
+            return []
+
+        self.start = now
+
+        events = []
+
+        for container, streams in self.containers.values():
+            info = container._info
+            attributes = riemann.container_attributes(info, time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)))
+
+            for stream, counts in sorted(streams.items()):
+                prefix = 'container %s %s ' % (info['Name'].lstrip('/'), stream)
+
+                values = [('lines', counts[0]), ('bytes', counts[1])]
+                values.extend(('level ' + level, n) for level, n in sorted(counts[2].items()))
+
+                for name, n in values:
+                    events.append({
+                        'time': int(now),
+                        'state': 'ok',
+                        'service': prefix + name,
+                        'tags': [],
+                        'ttl': 2 * self.seconds,
+                        'attributes': attributes,
+                        'metric_sint64': n,
+                    })
+
+                # levels seen are sent as 0 rather than left to expire
+                counts[0] = counts[1] = 0
+                counts[2] = dict.fromkeys(counts[2], 0)
+
+        return events
@@ -0,0 +1,149 @@
+import random
+
+__all__ = ['Wheel']
+
+
+class Timer(object):
+
+    __slots__ = ['when', 'period', 'callback', 'args', 'slot']
+
+    def __init__(self, when, period, callback, args):
+        self.when = when
+        self.period = period
+        self.callback = callback
+        self.args = args
+        self.slot = None
+
+
+class Wheel(object):
+    """Hierarchical timing wheel
+
+    Time moves on in ticks of resolution seconds. Level 0 has a slot per
+    tick, each level above has a slot per turn of the level below, a timer
+    sits in the lowest level that reaches its deadline and drops a level
+    every time its slot comes round, so scheduling and cancelling are O(1)
+    and advancing is O(1) per tick plus the timers that are due.
+
+        >>> wheel = Wheel(resolution=1, slots=4, levels=3, now=0)
+        >>> calls = []
+        >>> a = wheel.call_at(3, calls.append, 'a')
+        >>> b = wheel.call_at(21, calls.append, 'b')
+        >>> c = wheel.every(5, calls.append, 'c', start=2)
+        >>> d = wheel.call_at(9, calls.append, 'd')
+        >>> wheel.cancel(d)
+        >>> wheel.advance(2), calls
+        (1, ['c'])
+        >>> wheel.advance(20), calls
+        (4, ['c', 'a', 'c', 'c', 'c'])
+        >>> wheel.advance(21), calls[-1], len(wheel)
+        (1, 'b', 1)
+        >>> wheel.cancel(c)
+        >>> len(wheel)
+        0
+
+        >>> wheel = Wheel(resolution=1, slots=4, levels=1, now=0)
+        >>> e = wheel.call_at(10, calls.append, 'e')
+        >>> wheel.advance(9), wheel.advance(10), calls[-1]
+        (0, 1, 'e')
+
+    """
+
+    def __init__(self, resolution=0.05, slots=64, levels=4, now=0.0):
+        self.resolution = resolution
+        self.slots = slots
+
+        # ticks per slot of each level
+        self.spans = [slots ** level for level in range(levels)]
+        self.wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+
+        self.current = self.ticks(now)
+        self.timers = 0
+
+    def __len__(self):
+        return self.timers
+
+    def ticks(self, when):
+        return int(when / self.resolution)
+
+    def call_at(self, when, callback, *args):
+        timer = Timer(when, None, callback, args)
+        self.add(timer)
+        return timer
+
+    def every(self, period, callback, *args, start=None):
+        """Call callback every period seconds, from start or a random point in the first period"""
+        if start is None:
+            start = self.current * self.resolution + random.uniform(0, period)
+
+        timer = Timer(start, period, callback, args)
+        self.add(timer)
+        return timer
+
+    def add(self, timer, cascade=False):
+        # the current tick has run, unless its timers are still being cascaded
+        deadline = max(self.ticks(timer.when), self.current if cascade else self.current + 1)
+
+        for level, span in enumerate(self.spans):
+            if deadline // span - self.current // span < self.slots:
+                break
+        else:
+            # further out than the wheel reaches, comes round again later
+            deadline = (self.current // span + self.slots - 1) * span
+
+        timer.slot = self.wheels[level][deadline // span % self.slots]
+        timer.slot.add(timer)
+
+        self.timers += 1
+
+    def cancel(self, timer):
+        if timer.slot is not None:
+            timer.slot.discard(timer)
+            timer.slot = None
+            self.timers -= 1
+
+    def advance(self, now):
+        """Run every timer that is due by now, return how many ran"""
+        n = 0
+
+        target = self.ticks(now)
+
+        while self.current < target:
+            self.current += 1
+
+            # highest first, a timer may drop more than one level
+            for level in range(len(self.spans) - 1, 0, -1):
+                span = self.spans[level]
+                if self.current % span == 0:
+                    slot = self.wheels[level][self.current // span % self.slots]
+                    timers = list(slot)
+                    slot.clear()
+                    for timer in timers:
+                        timer.slot = None
+                        self.timers -= 1
+                        self.add(timer, cascade=True)
+
+            slot = self.wheels[0][self.current % self.slots]
+
+            for timer in list(slot):
+                # cancelled by an earlier callback
+                if timer.slot is not slot:
+                    continue
+
+                self.cancel(timer)
+
+                # clamped into the last slot, further out than the wheel reaches
+                if self.ticks(timer.when) > self.current:
+                    self.add(timer)
+                    continue
+
+                if timer.period is not None:
+                    # skip periods missed while behind
+                    timer.when += timer.period
+                    while self.ticks(timer.when) <= self.current:
+                        timer.when += timer.period
+                    self.add(timer)
+
+                timer.callback(*timer.args)
+                n += 1
+
+        return n
@@ -0,0 +1,93 @@
+__all__ = ['Window']
+
+METRICS = ('metric_sint64', 'metric_d', 'metric_f')
+
+
+class Window(object):
+    """Aggregate metric events per service over fixed windows
+
+    Nothing is passed on until a window closes, then every service seen
+    gets one event per aggregate: "last" under its own service name, "min",
+    "max" and "mean" with the aggregate appended. Events without a metric
+    go straight through.
+
+        >>> window = Window(10, ['last', 'min', 'max', 'mean'])
+        >>> event = {'time': 100, 'service': 'container foo memory usage', 'ttl': 60, 'attributes': {}}
+        >>> window.handle([dict(event, metric_sint64=x) for x in (3, 9, 6)], 100)
+        []
+        >>> window.flush(105)
+        []
+        >>> [(x['service'], x.get('metric_sint64', x.get('metric_d')), x['ttl']) for x in window.flush(110)]  # doctest: +NORMALIZE_WHITESPACE
+        [('container foo memory usage', 6, 60), ('container foo memory usage min', 3, 60),
+         ('container foo memory usage max', 9, 60), ('container foo memory usage mean', 6.0, 60)]
+        >>> window.flush(120)
+        []
+
+        >>> window.handle([{'service': 'container foo stdout'}], 120)
+        [{'service': 'container foo stdout'}]
+
+    """
+
+    def __init__(self, seconds=10, aggregates=('last', 'max')):
+        self.seconds = seconds
+        self.aggregates = aggregates
+        self.start = None
+        self.services = {}
+
+    def handle(self, events, now):
+        passed = []
+
+        if self.start is None:
+            self.start = now - now % self.seconds
+
+        for event in events:
+            for k in METRICS:
+                if k in event:
+                    break
+            else:
+                passed.append(event)
+                continue
+
+            v = event[k]
+
+            a = self.services.get(event['service'])
+            if a is None:
+                self.services[event['service']] = [event, k, v, v, v, 1]
+            else:
+                a[0] = event
+                if v < a[2]:
+                    a[2] = v
+                if v > a[3]:
+                    a[3] = v
+                a[4] += v
+                a[5] += 1
+
+        return passed
+
+    def flush(self, now):
+        if self.start is None or now < self.start + self.seconds:
+            return []
+        self.start = now - now % self.seconds
+
+        events = []
+
+        for service, (last, k, min_, max_, sum_, n) in self.services.items():
+            for aggregate in self.aggregates:
+                event = dict(last)
+                event['ttl'] = max(last.get('ttl', 0), 2 * self.seconds)
+
+                if aggregate == 'last':
+                    pass
+                elif aggregate == 'mean':
+                    del event[k]
+                    event['service'] = '%s mean' % service
+                    event['metric_d'] = float(sum_) / n
+                else:
+                    event['service'] = '%s %s' % (service, aggregate)
+                    event[k] = min_ if aggregate == 'min' else max_
+
+                events.append(event)
+
+        self.services = {}
+
+        return events